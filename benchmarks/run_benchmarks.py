@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Time each stage of find_ORFs on the synthetic datasets and compare with a baseline
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import FastaIO
+import OutputIO
+import synthetic
+from CodonTable import getGeneticCode
+from find_ORFs import ORF, find_ORFs_Pos
+
+__author__ = "Guisen Chen <thecgs001@foxmil.com>"
+
+parser = argparse.ArgumentParser(description='Benchmark find_ORFs stage by stage', add_help=False)
+optional = parser.add_argument_group('optional arguments')
+optional.add_argument('-o', '--output', metavar='[output_file]', help='Write the results to this JSON file. defualt: None.', default=None)
+optional.add_argument('-baseline', '--baseline', metavar='[json_file]', help='Compare with the results of an earlier run. defualt: None.', default=None)
+optional.add_argument('-tolerance', '--tolerance', metavar='[float]', type=float, help='Slowdown over the baseline reported as a regression. defualt: 0.1.', default=0.1)
+optional.add_argument('-datasets', '--datasets', metavar='[str]', nargs='+', choices=sorted(synthetic.DATASETS), help='Datasets to run. defualt: all.', default=sorted(synthetic.DATASETS))
+optional.add_argument('-codontables', '--codontables', metavar='[int]', nargs='+', type=int, help='Genetic codes to run. defualt: 1 11.', default=[1, 11])
+optional.add_argument('-start_codon_models', '--start_codon_models', metavar='[int]', nargs='+', type=int, choices=[0,1], help='Start codon models to run. defualt: 0 1.', default=[0, 1])
+optional.add_argument('-scale', '--scale', metavar='[float]', type=float, help='Size of the datasets relative to the default (about 17 Mb in all). defualt: 1.0.', default=1.0)
+optional.add_argument('-repeat', '--repeat', metavar='[int]', type=int, help='Runs of each stage, the fastest is kept. defualt: 3.', default=3)
+optional.add_argument('-data_dir', '--data_dir', metavar='[dir]', help='Where the generated datasets are kept. defualt: benchmarks/data.',
+                      default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+optional.add_argument('-h', '--help', action='help', help='show this help message and exit')
+
+def best_time(func, repeat=3):
+    """Return (fastest wall time of repeat calls of func, result of the last call).
+    """
+    best = float('inf')
+    for i in range(max(repeat, 1)):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def git_version():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ''
+
+def parse(path):
+    return [(record.Name, str(record.Seq)) for record in FastaIO.FastaIO(path).parse()]
+
+def scan(records, codontable, start_codon_model):
+    return [(Name, seqence, strand, find_ORFs_Pos(seqence, codontable=codontable, start_codon_model=start_codon_model, strand=strand))
+            for Name, seqence in records for strand in ('+', '-')]
+
+def translate(scanned, codontable):
+    code = getGeneticCode(codontable)
+    proteins = []
+    for Name, seqence, strand, positions in scanned:
+        l = len(seqence)
+        for start, end in positions:
+            ORF = FastaIO.NucleicSeqence(seqence[start:end] if strand == '+' else seqence[l - end:l - start])
+            if strand == '-':
+                ORF = ORF.reverse_compliment()
+            proteins.append(str(ORF.translate(codontable=code)))
+    return proteins
+
+def output(scanned, outfmt=0):
+    def ORFs():
+        num = 1
+        for Name, seqence, strand, positions in scanned:
+            l = len(seqence)
+            for start, end in positions:
+                if strand == '-':
+                    start, end = l - end, l - start
+                yield ORF('ORF' + str(num), strand, Name, start + 1, end, end - start, seqence[start:end])
+                num += 1
+    with open(os.devnull, 'w') as f:
+        with OutputIO.get_writer(outfmt, f) as writer:
+            writer.write_all(ORFs())
+
+def run(datasets, codontables, start_codon_models, scale=1.0, repeat=3, data_dir='data'):
+    """Return {'dataset/stage[/table/model]': {'seconds', 'bases', 'ORFs'}} for every combination.
+    """
+    results = {}
+    for name in datasets:
+        path = synthetic.make_dataset(name, data_dir, scale)
+        seconds, records = best_time(lambda: parse(path), repeat)
+        bases = sum(len(seqence) for Name, seqence in records)
+        results['{}/parse'.format(name)] = {'seconds': seconds, 'bases': bases}
+        for codontable in codontables:
+            for start_codon_model in start_codon_models:
+                key = '{}/{{}}/table{}/model{}'.format(name, codontable, start_codon_model)
+                seconds, scanned = best_time(lambda: scan(records, codontable, start_codon_model), repeat)
+                ORFs = sum(len(positions) for Name, seqence, strand, positions in scanned)
+                results[key.format('scan')] = {'seconds': seconds, 'bases': bases, 'ORFs': ORFs}
+                seconds, proteins = best_time(lambda: translate(scanned, codontable), repeat)
+                results[key.format('translate')] = {'seconds': seconds, 'bases': bases, 'ORFs': ORFs}
+                seconds, _ = best_time(lambda: output(scanned), repeat)
+                results[key.format('output')] = {'seconds': seconds, 'bases': bases, 'ORFs': ORFs}
+    return results
+
+def compare(results, baseline, tolerance=0.1):
+    """Print the ratio of every time to its baseline, return the keys slower than 1 + tolerance.
+    """
+    regressions = []
+    print('{:<50}{:>12}{:>12}{:>8}'.format('stage', 'baseline', 'current', 'ratio'))
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        before, after = baseline[key]['seconds'], result['seconds']
+        ratio = after / before if before else float('inf')
+        flag = ''
+        if ratio > 1 + tolerance:
+            regressions.append(key)
+            flag = '  slower'
+        elif ratio < 1 - tolerance:
+            flag = '  faster'
+        print('{:<50}{:>11.3f}s{:>11.3f}s{:>8.2f}{}'.format(key, before, after, ratio, flag))
+    return regressions
+
+def main(output_file=None, baseline_file=None, tolerance=0.1, **kwargs):
+    results = run(**kwargs)
+    report = {'version': git_version(), 'python': platform.python_version(), 'machine': platform.machine(),
+              'numpy': FastaIO.np is not None, 'scale': kwargs.get('scale', 1.0), 'results': results}
+    if output_file is not None:
+        with open(output_file, 'w') as f:
+            json.dump(report, f, indent=1)
+    if baseline_file is not None:
+        with open(baseline_file) as f:
+            baseline = json.load(f)
+        if baseline.get('scale') != report['scale']:
+            print('warning: baseline was run at scale {}, not {}'.format(baseline.get('scale'), report['scale']), file=sys.stderr)
+        return 1 if compare(results, baseline['results'], tolerance) else 0
+    for key, result in results.items():
+        print('{:<50}{:>10.3f}s{:>10.1f} Mb/s'.format(key, result['seconds'], result['bases'] / max(result['seconds'], 1e-9) / 1e6))
+    return 0
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    sys.exit(main(output_file=args.output, \
+                  baseline_file=args.baseline, \
+                  tolerance=args.tolerance, \
+                  datasets=args.datasets, \
+                  codontables=args.codontables, \
+                  start_codon_models=args.start_codon_models, \
+                  scale=args.scale, \
+                  repeat=args.repeat, \
+                  data_dir=args.data_dir))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Deterministic synthetic fasta inputs for the benchmarks, the same seed always gives the same file
+"""
+
+import os
+import random
+
+__author__ = "Guisen Chen <thecgs001@foxmil.com>"
+__all__ = ['random_seqence', 'scaffold_seqence', 'transcripts', 'chromosomes', 'at_rich', 'gc_rich', 
+           'n_scaffolds', 'DATASETS', 'write_fasta', 'make_dataset']
+
+def random_seqence(length, gc=0.5, rng=None):
+    """Return a random DNA seqence of length bases with a GC content of about gc.
+    """
+    rng = rng or random.Random(0)
+    weights = [(1 - gc) / 2, gc / 2, gc / 2, (1 - gc) / 2]
+    return ''.join(rng.choices('ACGT', weights, k=length))
+
+def scaffold_seqence(length, gap_rate=0.001, gap_len=(100, 5000), rng=None):
+    """Return a random seqence of length bases with runs of N starting at about gap_rate per base.
+    """
+    rng = rng or random.Random(0)
+    parts, size = [], 0
+    while size < length:
+        part = min(int(rng.expovariate(gap_rate)) + 1, length - size)
+        parts.append(random_seqence(part, rng=rng))
+        size += part
+        if size < length:
+            gap = min(rng.randint(*gap_len), length - size)
+            parts.append('N' * gap)
+            size += gap
+    return ''.join(parts)
+
+def transcripts(scale=1.0, seed=1):
+    """Many short records, like a transcriptome assembly.
+    """
+    rng = random.Random(seed)
+    for i in range(int(5000 * scale)):
+        yield 'transcript{} synthetic'.format(i + 1), random_seqence(rng.randint(200, 2000), rng.uniform(0.35, 0.6), rng)
+
+def chromosomes(scale=1.0, seed=2):
+    """A few long records, like a genome assembly.
+    """
+    rng = random.Random(seed)
+    for i in range(3):
+        yield 'chr{}'.format(i + 1), random_seqence(int(2000000 * scale), 0.41, rng)
+
+def at_rich(scale=1.0, seed=3):
+    """AT-rich seqence (GC 30%), stop codons are frequent and ORFs short.
+    """
+    rng = random.Random(seed)
+    yield 'at_rich', random_seqence(int(2000000 * scale), 0.3, rng)
+
+def gc_rich(scale=1.0, seed=4):
+    """GC-rich seqence (GC 65%), stop codons are rare and ORFs long.
+    """
+    rng = random.Random(seed)
+    yield 'gc_rich', random_seqence(int(2000000 * scale), 0.65, rng)
+
+def n_scaffolds(scale=1.0, seed=5):
+    """Scaffolds with many long runs of N.
+    """
+    rng = random.Random(seed)
+    for i in range(4):
+        yield 'scaffold{}'.format(i + 1), scaffold_seqence(int(500000 * scale), rng=rng)
+
+DATASETS = {'transcripts': transcripts, 'chromosomes': chromosomes, 'at_rich': at_rich, 
+            'gc_rich': gc_rich, 'n_scaffolds': n_scaffolds}
+
+def write_fasta(path, records, linewidth=60):
+    """Write (name, seqence) records to path as fasta, wrapped at linewidth.
+    """
+    with open(path, 'w') as f:
+        for name, seqence in records:
+            f.write('>' + name + '\n')
+            for i in range(0, len(seqence), linewidth):
+                f.write(seqence[i:i+linewidth] + '\n')
+    return path
+
+def make_dataset(name, directory, scale=1.0):
+    """Write the dataset name to directory (unless it is already there), return its path.
+    """
+    path = os.path.join(directory, '{}_{}.fa'.format(name, scale))
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        write_fasta(path + '.tmp', DATASETS[name](scale))
+        os.replace(path + '.tmp', path)
+    return path
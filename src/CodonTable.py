@@ -4,7 +4,7 @@
 #source https://www.ncbi.nlm.nih.gov/Taxonomy/Utils/wprintgc.cgi?chapter=tgencodes
 
 __author__ = "Guisen Chen <thecgs001@foxmil.com>"
-__all__ = ['getCodonTable', 'CodonTable']
+__all__ = ['getCodonTable', 'CodonTable', 'GeneticCode', 'getGeneticCode']
 
 CodonTable1=[{'TTT': 'F', 'TCT': 'S', 'TAT': 'Y', 'TGT': 'C', 
              'TTC': 'F', 'TCC': 'S', 'TAC': 'Y', 'TGC': 'C', 
@@ -149,6 +149,7 @@ CodonTable11=[{'TTT': 'F', 'TCT': 'S', 'TAT': 'Y', 'TGT': 'C',
               'CTT': 'L', 'CCT': 'P', 'CAT': 'H', 'CGT': 'R',
               'CTC': 'L', 'CCC': 'P', 'CAC': 'H', 'CGC': 'R',
               'CTA': 'L', 'CCA': 'P', 'CAA': 'Q', 'CGA': 'R',
+              'CTG': 'L', 'CCG': 'P', 'CAG': 'Q', 'CGG': 'R',
               'ATT': 'I', 'ACT': 'T', 'AAT': 'N', 'AGT': 'S',
               'ATC': 'I', 'ACC': 'T', 'AAC': 'N', 'AGC': 'S',
               'ATA': 'I', 'ACA': 'T', 'AAA': 'K', 'AGA': 'R',
@@ -468,3 +469,62 @@ def getCodonTable(arg=1):
             if arg in CodonTable[key][1] or arg.replace('_',' ', 1) in CodonTable[key][1] or arg.replace('-',' ', 1) in CodonTable[key][1]:
                 res = CodonTable[key][0]
                 return res
+
+BASES = 'TCAG'
+#碱基编码为0-3 (TCAG), 其余字符为4, 用于bytes.translate
+BASE_CODES = bytearray(b'\x04' * 256)
+for code, base in enumerate(BASES + 'U'):
+    BASE_CODES[ord(base)] = BASE_CODES[ord(base.lower())] = code % 4
+BASE_CODES = bytes(BASE_CODES)
+_COMPLEMENT = str.maketrans('ATGCatgc', 'TACGtacg')
+
+def reverse_complement(codon):
+    return codon.translate(_COMPLEMENT)[::-1]
+
+class GeneticCode:
+    """编译后的密码子表, 由getGeneticCode按表号缓存
+    """
+    def __init__(self, ID, table, start_codons, stop_codons, names=()):
+        self.ID = ID
+        self.names = tuple(names)
+        self.table = dict(table)
+        self.start_codons = frozenset(start_codons)
+        self.stop_codons = frozenset(stop_codons)
+        self.rc_start_codons = frozenset(map(reverse_complement, self.start_codons))
+        self.rc_stop_codons = frozenset(map(reverse_complement, self.stop_codons))
+        #64个密码子按TCAG顺序排列的氨基酸, 下标为c1*16 + c2*4 + c3
+        self.amino_acids = ''.join(self.table[a + b + c] for a in BASES for b in BASES for c in BASES)
+        #125个密码子编码对应的氨基酸字节, 下标为c1*25 + c2*5 + c3, 含有编码4的密码子为X
+        codon_bytes = bytearray(b'X' * 256)
+        for codon, aa in self.table.items():
+            c1, c2, c3 = codon.encode().translate(BASE_CODES)
+            codon_bytes[c1*25 + c2*5 + c3] = ord(aa)
+        self.codon_bytes = bytes(codon_bytes)
+        
+    def __repr__(self):
+        return 'GeneticCode({}, {})'.format(self.ID, self.names)
+    
+    def __reduce__(self):
+        return getGeneticCode, (self.ID,)
+        
+    def translate(self, codon):
+        return self.table.get(codon.upper(), 'X')
+
+_GeneticCodes = {}
+
+def getGeneticCode(arg=1):
+    """Return the compiled GeneticCode of a table number or name, cached so it is only built once.
+    """
+    if isinstance(arg, GeneticCode):
+        return arg
+    if arg not in _GeneticCodes:
+        res = getCodonTable(arg)
+        if res is None:
+            raise Exception("unknown codon table {}".format(arg))
+        for key in CodonTable:
+            if CodonTable[key][0] is res:
+                ID = int(key[len('CodonTable'):])
+                if ID not in _GeneticCodes:
+                    _GeneticCodes[ID] = GeneticCode(ID, res[0], res[1], res[2], CodonTable[key][1])
+                _GeneticCodes[arg] = _GeneticCodes[ID]
+    return _GeneticCodes[arg]
@@ -7,131 +7,766 @@ import io
 import bz2
 import sys
 import gzip
+import glob
+import mmap
+import zlib
+import queue
+import struct
+import threading
 import zipfile
 import tarfile
 import warnings
-from CodonTable import getCodonTable
+from collections import namedtuple, deque, OrderedDict
+from functools import lru_cache
+from itertools import islice, groupby, chain
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
+from CodonTable import getGeneticCode, BASE_CODES
+import RunStats
+import TwoBitIO
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 __author__ = "Guisen Chen <thecgs001@foxmil.com>"
-__all__ = ['get_file_obj', 'get_files_obj', 'FastaIO', 'FastaSeqence', 
-           'BaseSeqence', 'NucleicSeqence', 'ProteinSeqence','guess_fasta_type']
+__all__ = ['get_file_obj', 'get_files_obj', 'BlockReader', 'FastaIO', 'FastaSeqence', 
+           'BaseSeqence', 'NucleicSeqence', 'ProteinSeqence','guess_fasta_type',
+           'read_fasta_blocks', 'get_file_mmap', 'index_fasta_buffer', 'MappedNucleicSeqence',
+           'FaiRecord', 'build_fai', 'expand_inputs', 'read_fai', 'write_fai', 'get_translate_tables', 'iter_threaded',
+           'read_fasta_chunks', 'TwoBitSeqence', 'gap_runs', 'masked_runs']
 
-def get_file_obj(in_file):
-    """Return a file object from an input file.
+BLOCKSIZE = 1 << 22
+_WHITESPACE = b' \t\r\n\x0b\x0c'
+_RNA2DNA = bytes.maketrans(b'Uu', b'Tt')
+_COMPLIMENT = str.maketrans('ATGCatgc', 'TACGtacg')
+_U2T = str.maketrans('Uu', 'Tt')
+_PROTEIN_LETTERS = b'MVLIPFYWSQDEKRH'
+TYPE_CHECKS = ('full', 'sample', 'none')
+TYPE_SAMPLE_SIZE = 1 << 16
+NUMPY_MIN_LEN = 90
+MAX_OPEN_FILES = 32
+SMALL_FILE_SIZE = 1 << 20
+GAP_MIN_LEN = 10
+SLICE_BLOCK = 1 << 16
+_GAP_END = re.compile('[Nn]*')
+_LOWER_RUN = re.compile('[a-z]+')
+
+if np is not None:
+    _BASE_CODES = np.frombuffer(BASE_CODES, dtype=np.uint8)
+
+class BlockReader(io.RawIOBase):
+    """Binary file object reading from an iterator of bytes blocks
+    
+    A read offset into the current block is kept, so a small read copies only the
+    bytes it returns, not what is left of the block.
+    """
+    def __init__(self, blocks, name='', close=None):
+        self._blocks = iter(blocks)
+        self._data = b''
+        self._pos = 0
+        self._close = close
+        self.name = name
+        
+    def readable(self):
+        return True
+    
+    def read(self, size=-1):
+        if size is None or size < 0:
+            data = self._data[self._pos:] + b''.join(self._blocks)
+            self._data, self._pos = b'', 0
+            return data
+        parts = []
+        while size > 0:
+            if self._pos >= len(self._data):
+                block = next(self._blocks, None)
+                if block is None:
+                    break
+                self._data, self._pos = block, 0
+                continue
+            part = self._data[self._pos:self._pos + size]
+            self._pos += len(part)
+            size -= len(part)
+            parts.append(part)
+        return parts[0] if len(parts) == 1 else b''.join(parts)
+
+    def peek(self, size=1):
+        """Return the next size bytes (fewer at the end) without consuming them.
+        """
+        while len(self._data) - self._pos < size:
+            block = next(self._blocks, None)
+            if block is None:
+                break
+            self._data, self._pos = self._data[self._pos:] + block, 0
+        return self._data[self._pos:self._pos + size]
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+    
+    def close(self):
+        if not self.closed and self._close is not None:
+            self._close()
+        super().close()
+    
+    
+def iter_blocks(file, blocksize=BLOCKSIZE):
+    """Yield the blocks of a binary file object, then close it.
+    """
+    try:
+        while True:
+            block = file.read(blocksize)
+            if not block:
+                return
+            yield block
+    finally:
+        file.close()
+    
+    
+def iter_threaded(iterable, prefetch=4, batch_size=1, name=None):
+    """Yield the items of iterable, produced by a background thread at most prefetch batches ahead.
+    
+    Items are passed in lists of batch_size. With name the depth of the queue is
+    reported to RunStats at every get.
+    """
+    items = queue.Queue(prefetch)
+    stop = threading.Event()
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+    def producer():
+        try:
+            iterator = iter(iterable)
+            while True:
+                batch = [item for item in islice(iterator, batch_size)]
+                if not batch or not put(batch):
+                    break
+            put(None)
+        except Exception as e:
+            put(e)
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
+    try:
+        while True:
+            if name is not None:
+                depth = items.qsize()
+                RunStats.queue_depth(name, depth, depth == 0)
+            batch = items.get()
+            if batch is None:
+                return
+            if isinstance(batch, Exception):
+                raise batch
+            yield from batch
+    finally:
+        stop.set()
+
+def iter_blocks_threaded(file, blocksize=BLOCKSIZE, prefetch=4):
+    """Yield the blocks of a binary file object read (and decompressed) by a background thread.
+    """
+    return iter_threaded(iter_blocks(file, blocksize), prefetch)
+    
+    
+def is_bgzf(in_file):
+    """Return True if in_file starts with a BGZF block header.
+    """
+    with open(in_file, 'rb') as file:
+        header = file.read(18)
+    return len(header) == 18 and header[:4] == b'\x1f\x8b\x08\x04' and header[10:16] == b'\x06\x00BC\x02\x00'
+    
+    
+def iter_bgzf_blocks(in_file, threads=1):
+    """Yield the decompressed data of a BGZF file, its blocks being inflated on threads threads.
+    """
+    def blocks(file):
+        while True:
+            header = file.read(18)
+            if not header:
+                return
+            if len(header) < 18 or header[12:14] != b'BC':
+                raise Exception("{} is not a BGZF file".format(in_file))
+            yield header + file.read(struct.unpack('<H', header[16:18])[0] - 17)
+    
+    with open(in_file, 'rb') as file, ThreadPoolExecutor(threads) as pool:
+        pending = deque()
+        for block in blocks(file):
+            pending.append(pool.submit(zlib.decompress, block, 31))
+            if len(pending) >= threads * 16:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    
+    
+def iter_members(in_file, threads=1):
+    """Yield the blocks of every regular file in a tar or zip archive, a newline between members.
+    """
+    if in_file.endswith(".zip"):
+        with zipfile.ZipFile(in_file) as zobj:
+            for info in zobj.infolist():
+                if not info.is_dir():
+                    yield from iter_blocks(zobj.open(info))
+                    yield b'\n'
+        return
+    fileobj = BlockReader(iter_decompressed(in_file.replace('.tgz', '.tar.gz'), threads, path=in_file), in_file)
+    with tarfile.open(fileobj=fileobj, mode='r|') as tp:
+        for member in tp:
+            if member.isfile():
+                yield from iter_blocks(tp.extractfile(member))
+                yield b'\n'
+    
+    
+def iter_small_decompressed(path, decompress):
+    """Yield the whole decompressed data of a small compressed file as one block.
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    yield decompress(data)
+    
+    
+def iter_decompressed(in_file, threads=1, path=None):
+    """Yield the decompressed blocks of a plain, gzip, bgzip or bzip2 file.
+    
+    in_file's extension selects the format, path (default in_file) is the file read.
+    gzip and bzip2 are decompressed by a background thread, bgzip on threads threads,
+    files of at most SMALL_FILE_SIZE bytes in one call, a thread costing more to start.
+    """
+    path = path or in_file
+    if (in_file.endswith(".gz") or in_file.endswith(".bz") or in_file.endswith(".bz2")) and os.path.getsize(path) <= SMALL_FILE_SIZE:
+        return iter_small_decompressed(path, gzip.decompress if in_file.endswith(".gz") else bz2.decompress)
+    if in_file.endswith(".gz"):
+        if threads > 1 and is_bgzf(path):
+            return iter_bgzf_blocks(path, threads)
+        return iter_blocks_threaded(gzip.open(path, "rb"))
+    elif in_file.endswith(".bz") or in_file.endswith(".bz2"):
+        return iter_blocks_threaded(bz2.BZ2File(path, "rb"))
+    return iter_blocks(open(path, 'rb'))
+    
+    
+def get_file_obj(in_file, threads=1):
+    """Return a binary file object from an input file.
+    
+    Every fasta member of tar and zip archives is read, one after another.
     """
     if not os.path.exists(in_file) and in_file != "-":
         raise Exception("can't open {}".format(in_file))
     elif in_file == '-':
-        return sys.stdin
-    if in_file.find(".tar") > 0:
-        if in_file.endswith(".tar.gz"):
-            tp = tarfile.open(in_file, "r:gz")
-        elif in_file.endswith(".tar"):
-            tp = tarfile.open(in_file, "r")
-        elif in_file.endswith(".tar.bz2"):
-            tp = tarfile.open(in_file, "r:bz2")
-        return io.TextIOWrapper(tp)
-    elif in_file.endswith(".gz"):
-        return gzip.open(in_file, "rt")
-    elif in_file.endswith(".zip"):
-        zobj = zipfile.ZipFile(in_file)
-        zp = zobj.open(zobj.namelist()[0], "r")
-        return io.TextIOWrapper(zp)
-    elif in_file.endswith(".bz") or in_file.endswith(".bz2"):
-        return bz2.BZ2File(in_file, "rt")
+        return sys.stdin.buffer
+    if in_file.find(".tar") > 0 or in_file.endswith(".tgz") or in_file.endswith(".zip"):
+        blocks = iter_members(in_file, threads)
+    elif in_file.endswith(".gz") or in_file.endswith(".bz") or in_file.endswith(".bz2"):
+        blocks = iter_decompressed(in_file, threads)
     else:
-        return open(in_file,'r')
+        return open(in_file,'rb')
+    return BlockReader(blocks, in_file, blocks.close)
+    
+    
+def get_files_obj(in_files, threads=1):
+    """Accept a files list object, and return a list of binary file objects.
+    """
+    return [get_file_obj(infile, threads) for infile in in_files]
+    
+    
+def expand_inputs(in_files):
+    """Return the list of input files named by in_files.
+    
+    '@list.txt' is replaced by the files listed in list.txt, one per line (blank
+    lines and lines starting with '#' are skipped), and a glob pattern that is not
+    itself a file by the files it matches, in sorted order.
+    """
+    paths = []
+    for in_file in in_files:
+        if in_file.startswith('@') and not os.path.exists(in_file):
+            with open(in_file[1:]) as f:
+                paths.extend(line.strip() for line in f if line.strip() and not line.startswith('#'))
+        elif glob.has_magic(in_file) and not os.path.exists(in_file):
+            matches = sorted(glob.glob(in_file))
+            if not matches:
+                raise Exception("can't open {}, no file matches it".format(in_file))
+            paths.extend(matches)
+        else:
+            paths.append(in_file)
+    return paths
+    
+    
+def read_fasta_blocks(file, blocksize=BLOCKSIZE):
+    """Read a fasta file object in large blocks, yield (header, seqence) bytes of every record.
+    
+    Record boundaries are found with bytes.find, the sequence lines of a record are
+    collected as block slices and joined once, and whitespace is removed in one pass.
+    """
+    header = None
+    parts = []
+    data = b'\n' #使文件开头的'>'也以'\n>'的形式出现
+    eof = False
+    while not eof:
+        block = file.read(blocksize)
+        if isinstance(block, str):
+            block = block.encode()
+        eof = not block
+        data += block
+        pos = 0
+        while True:
+            site = data.find(b'\n>', pos)
+            if site < 0:
+                break
+            lineend = data.find(b'\n', site + 2)
+            if lineend < 0:
+                if not eof: #标题行不完整, 等待下一个数据块
+                    break
+                lineend = len(data)
+            if header is not None:
+                parts.append(data[pos:site])
+                yield header, b''.join(parts).translate(None, _WHITESPACE)
+            header = data[site + 2:lineend]
+            parts = []
+            pos = lineend
+        if eof or site >= 0:
+            tail = data[pos:]
+        else: #保留最后一个字节, 它可能是下一个标题行之前的'\n'
+            tail = data[-1:]
+            if header is not None:
+                parts.append(data[pos:-1])
+        data = tail
+    if header is not None:
+        parts.append(data)
+        yield header, b''.join(parts).translate(None, _WHITESPACE)
+    
+    
+def read_fasta_chunks(file, blocksize=BLOCKSIZE):
+    """Read a fasta file object in large blocks, yield (number, header, chunk) bytes for the seqence of every record.
+    
+    Unlike read_fasta_blocks a record is never joined: its seqence comes as one or
+    more chunks (whitespace removed) of at most about blocksize bytes, all with the
+    record number counted from 0. The first chunk of every record is empty, group the
+    chunks by number (e.g. with itertools.groupby) to stream records of any length.
+    """
+    number = -1
+    header = None
+    data = b'\n' #使文件开头的'>'也以'\n>'的形式出现
+    eof = False
+    while not eof:
+        block = file.read(blocksize)
+        if isinstance(block, str):
+            block = block.encode()
+        eof = not block
+        data += block
+        pos = 0
+        while True:
+            site = data.find(b'\n>', pos)
+            if site < 0:
+                break
+            lineend = data.find(b'\n', site + 2)
+            if lineend < 0:
+                if not eof: #标题行不完整, 等待下一个数据块
+                    break
+                lineend = len(data)
+            if header is not None and site > pos:
+                yield number, header, data[pos:site].translate(None, _WHITESPACE)
+            number += 1
+            header = data[site + 2:lineend]
+            yield number, header, b''
+            pos = lineend
+        if eof or site >= 0:
+            tail = data[pos:]
+        else: #保留最后一个字节, 它可能是下一个标题行之前的'\n'
+            tail = data[-1:]
+            if header is not None and len(data) - 1 > pos:
+                yield number, header, data[pos:-1].translate(None, _WHITESPACE)
+        data = tail
+    if header is not None and data:
+        yield number, header, data.translate(None, _WHITESPACE)
+    
+    
+def get_file_mmap(file):
+    """Return a read-only mmap of an uncompressed file object, or None if it can't be mapped.
+    """
+    if type(file) is not io.BufferedReader:
+        return None
+    try:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    
+    
+def index_fasta_buffer(buffer):
+    """Yield (header_start, header_end, seq_start, seq_end) offsets of every record in a fasta buffer.
+    """
+    size = len(buffer)
+    if buffer[:1] == b'>':
+        site = 0
+    else:
+        site = buffer.find(b'\n>') + 1
+        if site == 0:
+            return
+    while True:
+        lineend = buffer.find(b'\n', site)
+        if lineend < 0:
+            lineend = size
+        nxt = buffer.find(b'\n>', lineend)
+        yield site + 1, lineend, lineend, size if nxt < 0 else nxt
+        if nxt < 0:
+            return
+        site = nxt + 1
+    
+    
+FaiRecord = namedtuple('FaiRecord', ['name', 'length', 'offset', 'linebases', 'linewidth'])
+
+
+def build_fai(in_file):
+    """Index an uncompressed fasta file, return a list of samtools-style FaiRecord.
+    """
+    with open(in_file, 'rb') as file:
+        buffer = get_file_mmap(file)
+        if buffer is None:
+            return []
+        fai = []
+        for a, b, c, d in index_fasta_buffer(buffer):
+            name = buffer[a:b].split()[0].decode('utf-8', 'replace') if buffer[a:b].split() else ''
+            offset = min(c + 1, d)
+            lineend = buffer.find(b'\n', offset, d + 1)
+            region = buffer[offset:d].rstrip()
+            if lineend < 0:
+                # 单行且没有换行符的序列, 同samtools按有换行符计算行宽
+                linebases = len(region)
+                linewidth = linebases + 1
+            else:
+                linewidth = lineend + 1 - offset
+                linebases = len(buffer[offset:offset + linewidth].rstrip())
+                eols = region[linewidth - 1::linewidth]
+                if eols.strip(b'\n') or region.count(b'\n') != len(eols):
+                    raise Exception("different line length in sequence '{}' of {}".format(name, in_file))
+            length = len(region.translate(None, _WHITESPACE))
+            fai.append(FaiRecord(name, length, offset, linebases, linewidth))
+        buffer.close()
+    return fai
+    
+    
+def read_fai(fai_file):
+    """Read a .fai file, return a list of FaiRecord.
+    """
+    with open(fai_file) as file:
+        return [FaiRecord(line[0], *map(int, line[1:5])) for line in (line.rstrip('\n').split('\t') for line in file) if len(line) >= 5]
+    
+    
+def write_fai(fai, fai_file):
+    """Write a list of FaiRecord to a .fai file.
+    """
+    with open(fai_file, 'w') as file:
+        for record in fai:
+            file.write('\t'.join(map(str, record)) + '\n')
+    
     
+@lru_cache(maxsize=None)
+def get_translate_tables(codontable=1):
+    """Return (codon dict, 125-entry uint8 array) used to translate with codontable.
     
-def get_files_obj(in_files):
-    """Accept a files list object, and return a iters _io.TextIOWrapper list object.
+    The array is a numpy view of GeneticCode.codon_bytes, indexed by c1*25 + c2*5 + c3
+    with bases coded 0-3 (TCAG) and any other character coded 4. It is None when
+    numpy isn't installed.
     """
-    return [get_file_obj(infile) for infile in in_files]
+    code = getGeneticCode(codontable)
+    array = None if np is None else np.frombuffer(code.codon_bytes, dtype=np.uint8, count=125)
+    return code.table, array
     
     
-def guess_fasta_type(seqence):
+def guess_fasta_type(seqence, sample_size=None):
     """判断fasta file的文件类型，氨基酸序列返回True, 核酸序列返回False
+    
+    seqence may be a str or a bytes-like object, it is checked in one bytes.translate
+    pass. With sample_size only the first sample_size characters are checked.
     """
-    res = False
-    if ("M" in seqence) or ("V" in seqence) or ("L" in seqence)     or ("I" in seqence) or ("P" in seqence) or ("F" in seqence)     or ("Y" in seqence) or ("W" in seqence) or ("S" in seqence)     or ("Q" in seqence) or ("D" in seqence) or ("E" in seqence)     or ("K" in seqence) or ("R" in seqence) or ("H" in seqence) :
-        res = True
-    return res
+    if sample_size is not None:
+        seqence = seqence[:sample_size]
+    if isinstance(seqence, str):
+        seqence = seqence.encode('latin-1', 'replace')
+    else:
+        seqence = bytes(seqence)
+    return len(seqence.translate(None, _PROTEIN_LETTERS)) != len(seqence)
     
     
+def _close_file(file):
+    if file is not sys.stdin.buffer:
+        file.close()
+
+def gap_runs(seqence, min_len=GAP_MIN_LEN):
+    """Return the sorted (start, end) runs of at least min_len N (or n) of a seqence string.
+    
+    Runs are found with str.find, which skips over the bases much faster than a
+    regular expression would.
+    """
+    runs = []
+    for base in 'Nn':
+        gap = base * min_len
+        start = seqence.find(gap)
+        while start >= 0:
+            end = _GAP_END.match(seqence, start).end()
+            runs.append((start, end))
+            start = seqence.find(gap, end)
+    if not runs:
+        return runs
+    # 大小写混合的N会被找到两次, 合并重叠的区间
+    runs.sort()
+    merged = [runs[0]]
+    for start, end in runs[1:]:
+        if start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def masked_runs(seqence):
+    """Return the sorted (start, end) runs of lower case (soft-masked) bases of a seqence string.
+    """
+    return [match.span() for match in _LOWER_RUN.finditer(seqence)]
+
 class FastaIO:
     """FastaIO parser
+    
+    files is a file name or a list of them, expanded by expand_inputs. The files are
+    opened one at a time as they are read, with prefetch the next prefetch files are
+    opened (and small compressed ones decompressed) ahead by a background thread. fetch
+    keeps at most MAX_OPEN_FILES open.
+    
+    type_check decides how parse() looks for protein records, which are skipped with a
+    warning: 'full' checks the whole seqence, 'sample' only its first TYPE_SAMPLE_SIZE
+    characters and 'none' trusts the input.
     """
-    def __init__(self, files):
-        if not isinstance(files, list):
-            self._files = get_files_obj([files])
-        else:
-            self._files = get_files_obj(files)
-        self._strat = -1
+    def __init__(self, files, use_mmap=False, threads=1, type_check='full', prefetch=1):
+        self._handles = OrderedDict()
+        if type_check not in TYPE_CHECKS:
+            raise ValueError('type_check must be one of {}, not {!r}'.format(TYPE_CHECKS, type_check))
+        self._paths = expand_inputs(files if isinstance(files, list) else [files])
+        self._threads = threads
+        self._prefetch = prefetch
+        self._mmap = use_mmap
+        self._fai = None
+        self._type_check = type_check
         
     def __len__(self):
-        return len(self._files)
+        return len(self._paths)
     
     def __str__(self):
-        return str(self._files)
+        return str(self._paths)
     
     def __iter__(self):
-        return self
-    
-    def __next__(self):
-        self._strat += 1
-        if len(self._files) <= self._strat:
-            raise StopIteration
-        else:
-            return self._files[self._strat]
+        return iter(self._paths)
     
     def __getitem__(self, item):
-        return self._files[item]
+        return self._paths[item]
     
     def __enter__(self):
          return self
     
-    def __exit__(self):
-        for file in self._files:
-            file.close()
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def __del__(self):
-        del self
-        return None
+        self.close()
+        
+    def close(self):
+        """Close the files kept open by fetch.
+        """
+        while self._handles:
+            _close_file(self._handles.popitem()[1])
         
     def names(self):
-        return [file.name for file in self._files]
+        return list(self._paths)
+    
+    def _open(self, path):
+        """Open path and start reading it: the first block is read, and decompressed for compressed files.
+        """
+        with RunStats.timer('open'):
+            file = get_file_obj(path, self._threads)
+            try:
+                if type(file) is io.BufferedReader and file is not sys.stdin.buffer and hasattr(os, 'posix_fadvise'):
+                    try:
+                        # 让系统提前把整个文件读入页缓存
+                        os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+                    except OSError:
+                        pass
+                file.peek(1)
+            except BaseException:
+                _close_file(file)
+                raise
+        RunStats.count('files')
+        return file
+    
+    def files(self):
+        """Yield the input files as binary file objects, each closed once the next one is asked for.
+        """
+        if self._prefetch < 1:
+            for path in self._paths:
+                file = self._open(path)
+                try:
+                    yield file
+                finally:
+                    _close_file(file)
+            return
+        paths = iter(self._paths)
+        with ThreadPoolExecutor(1) as executor:
+            pending = deque(executor.submit(self._open, path) for path in islice(paths, self._prefetch))
+            try:
+                while pending:
+                    file = pending.popleft().result()
+                    try:
+                        for path in islice(paths, 1):
+                            pending.append(executor.submit(self._open, path))
+                        yield file
+                    finally:
+                        _close_file(file)
+            finally:
+                for future in pending:
+                    if not future.cancel() and future.exception() is None:
+                        _close_file(future.result())
+    
+    def _handle(self, path):
+        """Return an open file object of path for random access, closing the least recently used one past MAX_OPEN_FILES.
+        """
+        file = self._handles.pop(path, None)
+        if file is None:
+            file = get_file_obj(path, self._threads)
+            while len(self._handles) >= MAX_OPEN_FILES:
+                _close_file(self._handles.popitem(last=False)[1])
+        self._handles[path] = file
+        return file
+    
+    def faidx(self):
+        """Return a dict of ID -> (file name, FaiRecord), reusing or writing <file>.fai next to every input.
+        """
+        if self._fai is None:
+            self._fai = {}
+            for path in self._paths:
+                file = self._handle(path)
+                if type(file) is not io.BufferedReader or file is sys.stdin.buffer:
+                    raise Exception("can't index {}, only uncompressed fasta files support random access".format(path))
+                if TwoBitIO.is_twobit(file):
+                    for record in TwoBitIO.read_twobit(file):
+                        self._fai.setdefault(record.name, (path, record))
+                    continue
+                fai_file = path + '.fai'
+                if os.path.exists(fai_file) and os.path.getmtime(fai_file) >= os.path.getmtime(path):
+                    fai = read_fai(fai_file)
+                else:
+                    fai = build_fai(path)
+                    try:
+                        write_fai(fai, fai_file)
+                    except OSError:
+                        pass
+                for record in fai:
+                    self._fai.setdefault(record.name, (path, record))
+        return self._fai
+    
+    def fetch(self, ID, start=None, end=None):
+        """Return the record ID, or its sub-region [start, end) (0-based), as a FastaSeqence.
+        """
+        if ID not in self.faidx():
+            raise Exception("can't find {} in {}".format(ID, self.names()))
+        path, record = self.faidx()[ID]
+        file = self._handle(path)
+        start = 0 if start is None else max(0, min(start, record.length))
+        end = record.length if end is None else max(start, min(end, record.length))
+        if isinstance(record, TwoBitIO.TwoBitRecord):
+            with RunStats.timer('fetch'):
+                packed, first = TwoBitIO.read_packed(file, record, start, end)
+                Seq = TwoBitIO.unpack_seqence(packed, first, start, end, record.n_blocks, record.mask_blocks)
+            RunStats.count('records')
+            record = FastaSeqence((ID, ID, '', NucleicSeqence._wrap(Seq)))
+            record.Offset = start
+            return record
+        if record.linebases:
+            a = record.offset + start // record.linebases * record.linewidth + start % record.linebases
+            b = record.offset + end // record.linebases * record.linewidth + end % record.linebases
+        else:
+            a = b = record.offset
+        with RunStats.timer('fetch'):
+            file.seek(a)
+            Seq = file.read(b - a).translate(_RNA2DNA, _WHITESPACE).decode('latin-1')
+        RunStats.count('records')
+        record = FastaSeqence((ID, ID, '', NucleicSeqence._wrap(Seq)))
+        record.Offset = start
+        return record
     
     def parse(self):
-        for file in self._files:
-            for lineno, line in enumerate(file):
-                if  line.strip().startswith('>'):
-                    if lineno != 0:
-                        if guess_fasta_type(Seq):
-                            messege = '\033[91m' + Name +'\033[93m is a protein sequence. Please check your sequence and enter a nucleic acid sequence.\033[0m'
-                            warnings.warn(messege, category=Warning)
-                            #print(Name +' is a protein sequence. Please check your sequence and enter a nucleic acid sequence.')
-                            #yield FastaSeqence((ID, Name, Description, ProteinSeqence(Seq)))
-                        else:
-                            yield FastaSeqence((ID, Name, Description, NucleicSeqence(Seq)))
-                    Name = line.strip()[1:]
-                    ID = line.strip().split()[0][1:]
-                    Description = Name[len(ID)+1:]
-                    Seq = ""
-                elif line.strip() == "":
-                    pass
+        for file in self.files():
+            if TwoBitIO.is_twobit(file):
+                for record in RunStats.iterate('parse', TwoBitIO.read_twobit(file)):
+                    RunStats.count('records')
+                    yield FastaSeqence((record.name, record.name, '', TwoBitSeqence(*TwoBitIO.read_packed(file, record), record)))
+                continue
+            buffer = get_file_mmap(file) if self._mmap else None
+            if buffer is None:
+                records = ((header, seqence, NucleicSeqence(seqence.decode('latin-1'))) for header, seqence in read_fasta_blocks(file))
+            else:
+                records = ((buffer[a:b], memoryview(buffer)[c:d], MappedNucleicSeqence(buffer, c, d)) for a, b, c, d in index_fasta_buffer(buffer))
+            sample_size = TYPE_SAMPLE_SIZE if self._type_check == 'sample' else None
+            for header, seqence, Seq in RunStats.iterate('parse', records):
+                ID, Name, Description = _split_header(header)
+                RunStats.count('records')
+                with RunStats.timer('type_check'):
+                    is_protein = self._type_check != 'none' and guess_fasta_type(seqence, sample_size)
+                if is_protein:
+                    messege = '\033[91m' + Name +'\033[93m is a protein sequence. Please check your sequence and enter a nucleic acid sequence.\033[0m'
+                    warnings.warn(messege, category=Warning)
                 else:
-                    Seq += line.strip()
-            yield FastaSeqence((ID, Name, Description, NucleicSeqence(Seq)))
+                    yield FastaSeqence((ID, Name, Description, Seq))
+
+    def stream(self):
+        """Yield (ID, Name, Description, chunks) for every record, chunks being an iterator of seqence strings read a block at a time.
+        
+        Records are never held whole in memory, the chunks of a record must be read
+        before the next record is asked for. Unless type_check is 'none' protein
+        records are looked for in the first TYPE_SAMPLE_SIZE bases only.
+        """
+        for file in self.files():
+            if TwoBitIO.is_twobit(file):
+                for record in TwoBitIO.read_twobit(file):
+                    RunStats.count('records')
+                    yield record.name, record.name, '', TwoBitSeqence.read_chunks(file, record)
+                continue
+            for number, chunks in groupby(read_fasta_chunks(file), key=itemgetter(0)):
+                header = next(chunks)[1]
+                ID, Name, Description = _split_header(header)
+                RunStats.count('records')
+                head, size = [], 0
+                if self._type_check != 'none':
+                    for _, _, chunk in chunks:
+                        head.append(chunk)
+                        size += len(chunk)
+                        if size >= TYPE_SAMPLE_SIZE:
+                            break
+                    if guess_fasta_type(b''.join(head), TYPE_SAMPLE_SIZE):
+                        messege = '\033[91m' + Name +'\033[93m is a protein sequence. Please check your sequence and enter a nucleic acid sequence.\033[0m'
+                        warnings.warn(messege, category=Warning)
+                        continue
+                rest = (chunk for _, _, chunk in chunks)
+                yield ID, Name, Description, (chunk.translate(_RNA2DNA).decode('latin-1') for chunk in chain(head, rest))
+
+def _split_header(header):
+    """Return (ID, Name, Description) of a fasta header line (bytes, without '>').
+    """
+    line = ('>' + header.decode('utf-8', 'replace')).strip()
+    Name = line[1:]
+    ID = line.split()[0][1:]
+    Description = Name[len(ID)+1:]
+    return ID, Name, Description
 
 class FastaSeqence:
     """返回一个fasta file格式的序列类
     """
+    __slots__ = ('ID', 'Name', 'Description', 'Seq', 'Offset')
+    
     def __init__(self, args):
         ID, Name, Description, Seq = args
         self.ID = ID
         self.Name = Name
         self.Description = Description
         self.Seq = Seq
+        self.Offset = 0
         
     def __len__(self):
         return len(self.Seq)
@@ -149,9 +784,11 @@ class FastaSeqence:
 class BaseSeqence:
     """返回一个序列类，是所有序列类的基类
     """
+    __slots__ = ('_Seq',)
+    _type = 'General'
+    
     def __init__(self, string):
         self._Seq = string
-        self._type = 'General'
         
     def __len__(self):
         return len(self._Seq)
@@ -172,10 +809,22 @@ class BaseSeqence:
 class NucleicSeqence(BaseSeqence):
     """返回一个核苷酸序列类
     """
+    __slots__ = ()
+    _type = 'Nucleic'
+    
     def __init__(self, string):
-        self._RNA2DNA = str.maketrans('Uu', 'Tt')
-        self._Seq = str(string).translate(self._RNA2DNA)
-        self._type = 'Nucleic'
+        string = str(string)
+        if 'U' in string or 'u' in string:
+            string = string.translate(_U2T)
+        self._Seq = string
+    
+    @staticmethod
+    def _wrap(string):
+        """Return a NucleicSeqence of a string known to be DNA, without scanning it for U.
+        """
+        seq = object.__new__(NucleicSeqence)
+        seq._Seq = string
+        return seq
     
     def GC(self):
         return self.count('G') + self.count('C')
@@ -189,41 +838,175 @@ class NucleicSeqence(BaseSeqence):
     def GC_skew(self):
         return round((self.count('G') - self.count('C'))/self.GC(), 4)
         
+    def gaps(self, min_len=GAP_MIN_LEN):
+        return gap_runs(self._Seq, min_len)
+    
+    def masked(self):
+        return masked_runs(self._Seq)
+    
     def upper(self):
-        return NucleicSeqence(self._Seq.upper())
+        return NucleicSeqence._wrap(self._Seq.upper())
     
     def lower(self):
-        return NucleicSeqence(self._Seq.lower())
+        return NucleicSeqence._wrap(self._Seq.lower())
         
     def translate(self, codontable=1):
-        codontable=getCodonTable(codontable)[0]
-        protein = ''
+        lookup, array = get_translate_tables(codontable)
         n = int(len(self._Seq)//3)*3
-        for site in range(0, n, 3):
-            if "N" in self._Seq[site:site+3]:
-                protein += "X"
-            else:
-                protein += codontable[self._Seq.upper()[site:site+3]]
+        if array is not None and n >= NUMPY_MIN_LEN:
+            codes = _BASE_CODES[np.frombuffer(self._Seq.encode('latin-1', 'replace'), dtype=np.uint8, count=n)]
+            protein = array[codes[0::3]*25 + codes[1::3]*5 + codes[2::3]].tobytes().decode('latin-1')
+        else:
+            seq = self._Seq.upper()
+            protein = ''.join([lookup.get(seq[site:site+3], 'X') for site in range(0, n, 3)])
         return ProteinSeqence(protein)
     
     def reverse(self):
-        return NucleicSeqence(self._Seq[::-1])
+        return NucleicSeqence._wrap(self._Seq[::-1])
     
     def compliment(self):
-        intab = "ATGCatgc"
-        outtab = "TACGtacg"
-        trantab = str.maketrans(intab, outtab)
-        return NucleicSeqence(self._Seq.translate(trantab))
+        return NucleicSeqence._wrap(self._Seq.translate(_COMPLIMENT))
     
     def reverse_compliment(self):
-        return NucleicSeqence(str(self.compliment())[::-1])
+        return NucleicSeqence._wrap(self._Seq.translate(_COMPLIMENT)[::-1])
+    
+class MappedNucleicSeqence(NucleicSeqence):
+    """返回一个以内存映射文件为后端的核苷酸序列类, 首次访问序列时才去除换行符
+    """
+    __slots__ = ('_buffer', '_start', '_end', '_cache')
+    
+    def __init__(self, buffer, start, end):
+        self._buffer = buffer
+        self._start = start
+        self._end = end
+        self._cache = None
+    
+    @property
+    def _Seq(self):
+        if self._cache is None:
+            self._cache = self._buffer[self._start:self._end].translate(_RNA2DNA, _WHITESPACE).decode('latin-1')
+        return self._cache
+    
+    def view(self):
+        """Return a zero-copy memoryview of the mapped record, line breaks included.
+        """
+        return memoryview(self._buffer)[self._start:self._end]
+    
+class TwoBitSeqence(NucleicSeqence):
+    """返回一个2-bit压缩存储的核苷酸序列类 (见TwoBitIO), 每次访问序列时才解压
+    
+    The bases take a quarter of the memory of a string. Runs of N and of lower
+    case bases are kept as blocks, as in .2bit files. The last SLICE_BLOCK bases
+    unpacked by slice are kept, so nearby short slices are cut from a string.
+    """
+    __slots__ = ('_packed', '_first', '_length', '_n_blocks', '_mask_blocks', '_cache')
+    
+    def __init__(self, packed, first=0, record=None):
+        self._packed = packed
+        self._first = first
+        self._length = record.length
+        self._n_blocks = record.n_blocks
+        self._mask_blocks = record.mask_blocks
+        self._cache = None
+    
+    @classmethod
+    def from_string(cls, string):
+        packed, n_blocks, mask_blocks = TwoBitIO.pack_seqence(str(string).translate(_U2T))
+        return cls(packed, 0, TwoBitIO.TwoBitRecord('', len(string), n_blocks, mask_blocks, 0))
+    
+    @staticmethod
+    def read_chunks(file, record, size=BLOCKSIZE):
+        """Yield the bases of record (a TwoBitRecord of file) as strings of size bases, reading one chunk at a time.
+        """
+        for start in range(0, record.length, size):
+            end = min(start + size, record.length)
+            packed, first = TwoBitIO.read_packed(file, record, start, end)
+            yield TwoBitIO.unpack_seqence(packed, first, start, end, record.n_blocks, record.mask_blocks)
+    
+    @property
+    def _Seq(self):
+        return self.slice(0, self._length)
+    
+    def __len__(self):
+        return self._length
+    
+    def __getitem__(self, item):
+        if isinstance(item, slice) and item.step in (None, 1):
+            return self.slice(*item.indices(self._length)[:2])
+        return self._Seq[item]
+    
+    def __repr__(self):
+        return str((self.slice(0, 20) + "......" + self.slice(self._length - 20, self._length), self._type))
+    
+    def slice(self, start, end):
+        """Return bases start to end as a string, unpacking only the bytes that hold them.
+        """
+        start, end = max(0, start), min(end, self._length)
+        if end <= start:
+            return ''
+        if end - start > SLICE_BLOCK:
+            return self._unpack(start, end)
+        cache = self._cache
+        if cache is None or start < cache[0] or end > cache[0] + len(cache[1]):
+            # ORF按位置顺序截取, 解压所在的整块供后续截取
+            block_start = start - start % SLICE_BLOCK
+            cache = self._cache = (block_start, self._unpack(block_start, max(end, block_start + SLICE_BLOCK)))
+        return cache[1][start - cache[0]:end - cache[0]]
+    
+    def _unpack(self, start, end):
+        end = min(end, self._length)
+        a = (start - self._first) // 4
+        return TwoBitIO.unpack_seqence(self._packed[a:(end - self._first + 3) // 4], self._first + a * 4, start, end, 
+                                       self._n_blocks, self._mask_blocks)
+    
+    def chunks(self, size=BLOCKSIZE):
+        for start in range(0, self._length, size):
+            yield self.slice(start, start + size)
+    
+    def gaps(self, min_len=GAP_MIN_LEN):
+        """Return the N blocks of at least min_len bases, read from the .2bit file instead of searched for.
+        """
+        return [(start, end) for start, end in self._n_blocks if end - start >= min_len]
+    
+    def masked(self):
+        return list(self._mask_blocks)
+    
+    def translate(self, codontable=1, start=0, end=None, strand='+'):
+        """Translate with codons looked up by their 2-bit codes, without unpacking the bases to a string (numpy only).
+        
+        Only bases start to end are translated, read from their reverse complement for strand '-'.
+        """
+        end = self._length if end is None else min(end, self._length)
+        n = max(end - start, 0) // 3 * 3
+        if np is None or n < NUMPY_MIN_LEN:
+            Seq = NucleicSeqence._wrap(self.slice(start, end))
+            if strand == '-':
+                Seq = Seq.reverse_compliment()
+            return Seq.translate(codontable)
+        if strand == '-':
+            start = end - n
+        else:
+            end = start + n
+        a = (start - self._first) // 4
+        codes = TwoBitIO.unpack_codes(self._packed[a:(end - self._first + 3) // 4], self._first + a * 4, start, end)
+        if strand == '-':
+            # 互补碱基的2-bit编码只差第二位 (T0-A2, C1-G3)
+            codes = codes[::-1] ^ 2
+        amino_acids = np.frombuffer(getGeneticCode(codontable).amino_acids.encode(), dtype=np.uint8)
+        protein = amino_acids[codes[0::3] * 16 + codes[1::3] * 4 + codes[2::3]]
+        for a, b in TwoBitIO.overlapping_blocks(self._n_blocks, start, end):
+            a, b = (end - b, end - a) if strand == '-' else (a - start, b - start)
+            protein[a // 3:(b + 2) // 3] = ord('X')
+        return ProteinSeqence(protein.tobytes().decode('latin-1'))
     
 class ProteinSeqence(BaseSeqence):
     """返回一个氨基酸序列类
     """
+    __slots__ = ()
+    _type = 'Protein'
+    
     def __init__(self, string):
         self._Seq = string
-        self._type = 'Protein'
         
     def remove_StopCodon(self):
         """移去终止密码子
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import sqlite3
+import hashlib
+import threading
+from array import array
+from itertools import chain
+from CodonTable import GeneticCode
+
+__author__ = "Guisen Chen <thecgs001@foxmil.com>"
+__all__ = ['ORFCache', 'seqence_hash', 'cache_key']
+
+# 扫描或过滤的结果变化时加一, 使旧的缓存失效
+CACHE_VERSION = 1
+
+def seqence_hash(seqence):
+    """Return the 16-byte BLAKE2 digest of a seqence string.
+    """
+    return hashlib.blake2b(seqence.encode('latin-1', 'replace'), digest_size=16).digest()
+
+def _option_value(value):
+    if isinstance(value, GeneticCode):
+        return value.ID
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(sorted(value))
+    return value
+
+def cache_key(digest, strand, options):
+    """Return the cache key of the ORFs of a seqence (by its seqence_hash digest) on strand, found with options (the keyword arguments of find_ORFs_Pos).
+    """
+    options = repr((CACHE_VERSION, strand, sorted((name, _option_value(value)) for name, value in options.items())))
+    return hashlib.blake2b(digest + options.encode(), digest_size=16).digest()
+
+
+class ORFCache:
+    """On-disk cache (a SQLite file) of the ORF spans of seqences, bounded to max_size bytes of spans
+
+    Entries are keyed by cache_key and evicted least recently used first once the
+    spans stored exceed max_size. Spans are kept in native byte order, the file is
+    meant to be reused on the machine that wrote it. A cache can be used from any
+    thread, one call at a time.
+    """
+    def __init__(self, path, max_size=1 << 30, commit_every=1000):
+        # -pipeline在读取线程中搜索, 连接可跨线程使用, 由锁保证一次一个调用
+        self._db = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._lock = threading.RLock()
+        self._db.execute('CREATE TABLE IF NOT EXISTS orfs (key BLOB PRIMARY KEY, spans BLOB NOT NULL, used INTEGER NOT NULL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS orfs_used ON orfs (used)')
+        used, size = self._db.execute('SELECT MAX(used), SUM(LENGTH(spans)) FROM orfs').fetchone()
+        self._clock = (used or 0) + 1
+        self._size = size or 0
+        self._max_size = max_size
+        self._commit_every = commit_every
+        self._changes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM orfs').fetchone()[0]
+
+    def _changed(self):
+        self._changes += 1
+        if self._changes >= self._commit_every:
+            self._db.commit()
+            self._changes = 0
+
+    def get(self, key):
+        """Return the list of (start, end) spans stored under key, None if there are none.
+        """
+        with self._lock:
+            row = self._db.execute('SELECT spans FROM orfs WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._db.execute('UPDATE orfs SET used = ? WHERE key = ?', (self._clock, key))
+            self._clock += 1
+            self._changed()
+        spans = array('q')
+        spans.frombytes(row[0])
+        return list(zip(spans[0::2], spans[1::2]))
+
+    def put(self, key, spans):
+        """Store (start, end) spans under key, evicting old entries if the cache grows over max_size.
+        """
+        data = array('q', chain.from_iterable(spans)).tobytes()
+        with self._lock:
+            row = self._db.execute('SELECT LENGTH(spans) FROM orfs WHERE key = ?', (key,)).fetchone()
+            self._db.execute('INSERT OR REPLACE INTO orfs (key, spans, used) VALUES (?, ?, ?)', (key, data, self._clock))
+            self._clock += 1
+            self._size += len(data) - (row[0] if row else 0)
+            self._changed()
+            if self._size > self._max_size:
+                self.evict(self._max_size)
+
+    def evict(self, max_size):
+        """Drop the least recently used entries until at most max_size bytes of spans are left.
+        """
+        with self._lock:
+            stale = []
+            for key, size in self._db.execute('SELECT key, LENGTH(spans) FROM orfs ORDER BY used'):
+                if self._size <= max_size:
+                    break
+                stale.append((key,))
+                self._size -= size
+            self._db.executemany('DELETE FROM orfs WHERE key = ?', stale)
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.commit()
+                self._db.close()
+                self._db = None
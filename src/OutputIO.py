@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import io
+import sys
+import bz2
+import zlib
+import struct
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+
+__author__ = "Guisen Chen <thecgs001@foxmil.com>"
+__all__ = ['get_output_obj', 'BgzfWriter', 'ORFWriter', 'FastaWriter', 'TsvWriter', 'GffWriter', 'WRITERS', 'get_writer']
+
+BGZF_BLOCK_SIZE = 0xff00
+BGZF_EOF = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+def _bgzf_block(data, level=6):
+    """Compress data (at most BGZF_BLOCK_SIZE bytes) into one BGZF block.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    cdata = compressor.compress(data) + compressor.flush()
+    header = struct.pack('<4BI2BH2BHH', 0x1f, 0x8b, 8, 4, 0, 0, 0xff, 6, ord('B'), ord('C'), 2, len(cdata) + 25)
+    return header + cdata + struct.pack('<II', zlib.crc32(data), len(data))
+
+
+class BgzfWriter(io.BufferedIOBase):
+    """Binary writer of BGZF files (blocked gzip, readable by gzip and indexable by tabix)
+
+    Full 64 KB blocks are compressed on a pool of threads threads (zlib releases the
+    GIL) and written in order, with at most threads * 4 blocks in flight.
+    """
+    def __init__(self, out_file, threads=1, level=6):
+        self._raw = open(out_file, 'wb')
+        self._level = level
+        self._data = bytearray()
+        self._threads = max(threads, 1)
+        self._pool = ThreadPoolExecutor(self._threads) if self._threads > 1 else None
+        self._pending = deque()
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        self._data += data
+        while len(self._data) >= BGZF_BLOCK_SIZE:
+            self._submit(bytes(self._data[:BGZF_BLOCK_SIZE]))
+            del self._data[:BGZF_BLOCK_SIZE]
+        return len(data)
+    
+    def _submit(self, data):
+        if self._pool is None:
+            self._raw.write(_bgzf_block(data, self._level))
+            return
+        self._pending.append(self._pool.submit(_bgzf_block, data, self._level))
+        while len(self._pending) > self._threads * 4:
+            self._raw.write(self._pending.popleft().result())
+    
+    def close(self):
+        if self.closed:
+            return
+        if self._data:
+            self._submit(bytes(self._data))
+            self._data = bytearray()
+        while self._pending:
+            self._raw.write(self._pending.popleft().result())
+        if self._pool is not None:
+            self._pool.shutdown()
+        self._raw.write(BGZF_EOF)
+        self._raw.close()
+        super().close()
+
+
+def get_output_obj(out_file, threads=1):
+    """Return a text file object to write to, out_file being a path, '-' or a file object.
+    
+    Paths ending with .gz or .bgz are written as BGZF, compressed on threads threads,
+    and paths ending with .bz2 as bzip2.
+    """
+    if out_file == '-' or out_file is None:
+        return sys.stdout
+    elif isinstance(out_file, str):
+        if out_file.endswith('.gz') or out_file.endswith('.bgz'):
+            return io.TextIOWrapper(BgzfWriter(out_file, threads), encoding='utf-8')
+        elif out_file.endswith('.bz2'):
+            return bz2.open(out_file, 'wt')
+        return open(out_file, 'w')
+    else:
+        return out_file
+
+
+class ORFWriter:
+    """ORF输出类的基类, 子类只需定义header和template
+
+    template is formatted with the fields of an ORF tuple in order:
+    {0} ID, {1} Strand, {2} Source, {3} Start, {4} End, {5} Length, {6} Seq.
+    ORFs are formatted in batches of batch_size and written with one write call per batch.
+    """
+    header = ''
+    template = ''
+
+    def __init__(self, out_file=None, batch_size=10000, threads=1):
+        self._out = get_output_obj(out_file, threads)
+        self._own = self._out is not out_file and self._out is not sys.stdout
+        self._batch_size = batch_size
+        self._buffer = []
+        self._header = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write_header(self):
+        if not self._header:
+            self._header = True
+            if self.header:
+                self._out.write(self.header)
+
+    def write(self, orf):
+        self.write_header()
+        self._buffer.append(self.template.format(*orf))
+        if len(self._buffer) >= self._batch_size:
+            self.flush()
+
+    def write_all(self, orfs):
+        self.write_header()
+        self.flush()
+        fmt = self.template.format
+        orfs = iter(orfs)
+        while True:
+            batch = ''.join([fmt(*orf) for orf in islice(orfs, self._batch_size)])
+            if not batch:
+                break
+            self._out.write(batch)
+
+    def flush(self):
+        if self._buffer:
+            self._out.write(''.join(self._buffer))
+            self._buffer = []
+
+    def close(self):
+        self.write_header()
+        self.flush()
+        if self._own:
+            self._out.close()
+        else:
+            self._out.flush()
+
+
+class FastaWriter(ORFWriter):
+    template = '>{0}\tLength: {5}\tStrand: {1}\tSource: {2}:{3}-{4}\n{6}\n'
+
+
+class TsvWriter(ORFWriter):
+    header = 'ID\tStrand\tSource\tStart\tEnd\tLength\tSeqence\n'
+    template = '{0}\t{1}\t{2}\t{3}\t{4}\t{5}\t{6}\n'
+
+
+class GffWriter(ORFWriter):
+    template = '{2}\tfind_ORFs\tORF\t{3}\t{4}\t.\t{1}\t.\tID={0}; Length={5}; Seqence={6};\n'
+
+
+WRITERS = {0: FastaWriter, 1: TsvWriter, 2: GffWriter}
+
+def get_writer(outfmt=0, out_file=None, **kwargs):
+    """Return the ORFWriter of an -outfmt number.
+    """
+    return WRITERS[outfmt](out_file, **kwargs)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+__author__ = "Guisen Chen <thecgs001@foxmil.com>"
+__all__ = ['RunStats', 'current', 'collect', 'timer', 'iterate', 'count', 'queue_depth', 'peak_rss']
+
+_current = None
+
+def peak_rss(who=None):
+    """Return the peak resident set size in bytes of this process (or of its finished children), None if unknown.
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who is None else who)
+    # Linux 以KB计, macOS 以字节计
+    return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+
+
+class RunStats:
+    """Wall and CPU time per stage, counters and queue depths of one run
+
+    Stage timers nest: while a stage runs inside another, time is only charged to
+    the inner one, so the stage times add up to the time spent in timed code. Each
+    thread has its own nesting and CPU time is counted per thread, so stages run on
+    different threads can add up to more than the wall time.
+    """
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self.queues = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._start = (time.perf_counter(), time.process_time())
+
+    @property
+    def _stack(self):
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
+
+    def _charge(self, entry, now, calls=0):
+        with self._lock:
+            stage = self.stages.setdefault(entry[0], [0.0, 0.0, 0])
+            stage[0] += now[0] - entry[1][0]
+            stage[1] += now[1] - entry[1][1]
+            stage[2] += calls
+        entry[1] = now
+
+    def start(self, stage):
+        now = (time.perf_counter(), time.thread_time())
+        stack = self._stack
+        if stack:
+            self._charge(stack[-1], now)
+        stack.append([stage, now])
+
+    def stop(self):
+        now = (time.perf_counter(), time.thread_time())
+        stack = self._stack
+        self._charge(stack.pop(), now, 1)
+        if stack:
+            stack[-1][1] = now
+
+    @contextmanager
+    def timer(self, stage):
+        self.start(stage)
+        try:
+            yield self
+        finally:
+            self.stop()
+
+    def iterate(self, stage, iterable):
+        """Yield the items of iterable, charging the time taken to produce each one to stage.
+        """
+        iterator = iter(iterable)
+        while True:
+            self.start(stage)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.stop()
+            yield item
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def queue_depth(self, name, depth, waited=False):
+        """Record the depth of the queue name seen by its consumer, and whether it had to wait for an item.
+        """
+        with self._lock:
+            queue = self.queues.setdefault(name, [0, 0, 0, 0])
+            queue[0] += 1
+            queue[1] += depth
+            queue[2] = max(queue[2], depth)
+            queue[3] += waited
+
+    def summary(self):
+        """Return the stats as a dict, rates are per second of wall time since the start.
+        """
+        wall = time.perf_counter() - self._start[0]
+        cpu = time.process_time() - self._start[1]
+        summary = {'wall': round(wall, 6), 'cpu': round(cpu, 6),
+                   'stages': {name: {'wall': round(stage[0], 6), 'cpu': round(stage[1], 6), 'calls': stage[2]} for name, stage in self.stages.items()}}
+        if self.queues:
+            summary['queues'] = {name: {'gets': queue[0], 'mean_depth': round(queue[1] / queue[0], 2), 'max_depth': queue[2], 'empty_waits': queue[3]}
+                                 for name, queue in self.queues.items()}
+        summary.update(self.counters)
+        for name in ('records', 'bases', 'ORFs'):
+            if name in self.counters:
+                summary[name + '_per_sec'] = round(self.counters[name] / wall, 1) if wall else None
+        summary['peak_rss'] = peak_rss()
+        if resource is not None:
+            summary['peak_rss_children'] = peak_rss(resource.RUSAGE_CHILDREN)
+        return summary
+
+    def write(self, file=sys.stderr):
+        file.write(json.dumps(self.summary(), indent=1) + '\n')
+
+
+@contextmanager
+def collect(stats=None):
+    """Make stats (a new RunStats if None) the one the FastaIO and find_ORFs hooks report to, within the with block.
+    """
+    global _current
+    previous, _current = _current, RunStats() if stats is None else stats
+    try:
+        yield _current
+    finally:
+        _current = previous
+
+def current():
+    return _current
+
+def timer(stage):
+    """Time a with block as stage when stats are being collected.
+    """
+    return nullcontext() if _current is None else _current.timer(stage)
+
+def iterate(stage, iterable):
+    return iterable if _current is None else _current.iterate(stage, iterable)
+
+def count(name, n=1):
+    if _current is not None:
+        _current.count(name, n)
+
+def queue_depth(name, depth, waited=False):
+    if _current is not None:
+        _current.queue_depth(name, depth, waited)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Read and write UCSC .2bit files, and pack sequences to 2 bits per base
+
+Bases are coded T=0, C=1, A=2, G=3 (the TCAG order of CodonTable), four to a byte
+with the first base in the high bits. Runs of N (any base other than ACGT) and of
+lower case bases are kept aside as (start, end) blocks.
+"""
+
+import re
+import struct
+from bisect import bisect_right
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+__author__ = "Guisen Chen <thecgs001@foxmil.com>"
+__all__ = ['TwoBitRecord', 'is_twobit', 'read_twobit', 'read_packed', 'pack_seqence', 'unpack_seqence',
+           'unpack_codes', 'overlapping_blocks', 'write_twobit']
+
+TWOBIT_SIGNATURE = 0x1A412743
+_SIGNATURES = {struct.pack('<I', TWOBIT_SIGNATURE): '<', struct.pack('>I', TWOBIT_SIGNATURE): '>'}
+
+TwoBitRecord = namedtuple('TwoBitRecord', ['name', 'length', 'n_blocks', 'mask_blocks', 'offset'])
+TwoBitRecord.__doc__ = 'One seqence of a .2bit file, offset is where its packed bases start in the file'
+
+_BASES = b'TCAG'
+_PACK = bytes.maketrans(b'TCAGtcag', b'\x00\x01\x02\x03\x00\x01\x02\x03')
+_UNPACK = [bytes(_BASES[byte >> shift & 3] for shift in (6, 4, 2, 0)) for byte in range(256)]
+_N_RUN = re.compile(r'[^ACGTacgt]+')
+_LOWER_RUN = re.compile(r'[a-z]+')
+
+if np is not None:
+    _UNPACK_ARRAY = np.frombuffer(b''.join(_UNPACK), dtype=np.uint8).reshape(256, 4)
+    _CODES_ARRAY = np.array([[byte >> shift & 3 for shift in (6, 4, 2, 0)] for byte in range(256)], dtype=np.uint8)
+
+def is_twobit(file):
+    """Return True if the binary file object (which must support peek or seek) starts with the .2bit signature.
+    """
+    if hasattr(file, 'peek'):
+        return file.peek(4)[:4] in _SIGNATURES
+    position = file.tell()
+    signature = file.read(4)
+    file.seek(position)
+    return signature in _SIGNATURES
+
+def _read(file, fmt):
+    return struct.unpack(fmt, file.read(struct.calcsize(fmt)))
+
+def read_twobit(file):
+    """Read the index and the record headers of a .2bit file object, return a list of TwoBitRecord in file order.
+    """
+    file.seek(0)
+    order = _SIGNATURES.get(file.read(4))
+    if order is None:
+        raise Exception('{} is not a .2bit file'.format(getattr(file, 'name', file)))
+    version, count, reserved = _read(file, order + '3I')
+    if version not in (0, 1):
+        raise Exception('unsupported .2bit version {}'.format(version))
+    index = []
+    for i in range(count):
+        name = file.read(file.read(1)[0]).decode('utf-8', 'replace')
+        offset, = _read(file, order + ('Q' if version == 1 else 'I'))
+        index.append((name, offset))
+    records = []
+    for name, offset in index:
+        file.seek(offset)
+        length, n_count = _read(file, order + '2I')
+        n_starts = _read(file, order + '{}I'.format(n_count))
+        n_sizes = _read(file, order + '{}I'.format(n_count))
+        mask_count, = _read(file, order + 'I')
+        mask_starts = _read(file, order + '{}I'.format(mask_count))
+        mask_sizes = _read(file, order + '{}I'.format(mask_count))
+        file.read(4)
+        records.append(TwoBitRecord(name, length, [(start, start + size) for start, size in zip(n_starts, n_sizes)],
+                                    [(start, start + size) for start, size in zip(mask_starts, mask_sizes)], file.tell()))
+    return records
+
+def read_packed(file, record, start=0, end=None):
+    """Return the packed bytes of record (a TwoBitRecord) holding bases start to end, and the base the first byte starts at.
+    """
+    end = record.length if end is None else end
+    file.seek(record.offset + start // 4)
+    return file.read((end + 3) // 4 - start // 4), start - start % 4
+
+def pack_seqence(seqence):
+    """Pack a seqence string, return (packed bytes, N blocks, lower case blocks).
+    """
+    n_blocks = [match.span() for match in _N_RUN.finditer(seqence)]
+    mask_blocks = [match.span() for match in _LOWER_RUN.finditer(seqence)]
+    codes = seqence.encode('latin-1', 'replace').translate(_PACK)
+    if n_blocks:
+        codes = re.sub(b'[^\x00-\x03]', b'\x00', codes)
+    codes += b'\x00' * (-len(codes) % 4)
+    if np is not None:
+        array = np.frombuffer(codes, dtype=np.uint8).reshape(-1, 4)
+        packed = (array[:, 0] << 6 | array[:, 1] << 4 | array[:, 2] << 2 | array[:, 3]).astype(np.uint8).tobytes()
+    else:
+        packed = bytes([a << 6 | b << 4 | c << 2 | d for a, b, c, d in zip(codes[0::4], codes[1::4], codes[2::4], codes[3::4])])
+    return packed, n_blocks, mask_blocks
+
+def overlapping_blocks(blocks, start, end):
+    """Yield the parts of the sorted (start, end) blocks that overlap start to end.
+    """
+    i = max(bisect_right(blocks, (start,)) - 1, 0)
+    for block_start, block_end in blocks[i:]:
+        if block_start >= end:
+            break
+        if block_end > start:
+            yield max(block_start, start), min(block_end, end)
+
+def unpack_seqence(packed, first, start, end, n_blocks=(), mask_blocks=()):
+    """Return bases start to end of a packed seqence whose first byte holds the bases from first on, as a string.
+    """
+    skip = start - first
+    if np is not None:
+        data = bytearray(_UNPACK_ARRAY[np.frombuffer(packed, dtype=np.uint8)].tobytes()[skip:skip + end - start])
+    else:
+        data = bytearray(b''.join(map(_UNPACK.__getitem__, packed))[skip:skip + end - start])
+    for block_start, block_end in overlapping_blocks(n_blocks, start, end):
+        data[block_start - start:block_end - start] = b'N' * (block_end - block_start)
+    for block_start, block_end in overlapping_blocks(mask_blocks, start, end):
+        data[block_start - start:block_end - start] = data[block_start - start:block_end - start].lower()
+    return data.decode('latin-1')
+
+def unpack_codes(packed, first, start, end):
+    """Return the 2-bit codes (0-3, TCAG) of bases start to end of a packed seqence as a numpy uint8 array, N blocks not applied.
+    """
+    skip = start - first
+    return _CODES_ARRAY[np.frombuffer(packed, dtype=np.uint8)].reshape(-1)[skip:skip + end - start]
+
+def write_twobit(path, records):
+    """Write (name, seqence) records to a .2bit file (version 0, little endian).
+    """
+    records = [(name.encode(), pack_seqence(seqence), len(seqence)) for name, seqence in records]
+    offset = 16 + sum(len(name) + 5 for name, packed, length in records)
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<4I', TWOBIT_SIGNATURE, 0, len(records), 0))
+        for name, (packed, n_blocks, mask_blocks), length in records:
+            f.write(struct.pack('<B', len(name)) + name + struct.pack('<I', offset))
+            offset += 16 + 8 * (len(n_blocks) + len(mask_blocks)) + len(packed)
+        for name, (packed, n_blocks, mask_blocks), length in records:
+            f.write(struct.pack('<2I', length, len(n_blocks)))
+            f.write(struct.pack('<{}I'.format(len(n_blocks)), *(start for start, end in n_blocks)))
+            f.write(struct.pack('<{}I'.format(len(n_blocks)), *(end - start for start, end in n_blocks)))
+            f.write(struct.pack('<I', len(mask_blocks)))
+            f.write(struct.pack('<{}I'.format(len(mask_blocks)), *(start for start, end in mask_blocks)))
+            f.write(struct.pack('<{}I'.format(len(mask_blocks)), *(end - start for start, end in mask_blocks)))
+            f.write(struct.pack('<I', 0))
+            f.write(packed)
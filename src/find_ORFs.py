@@ -2,16 +2,32 @@
 # coding: utf-8
 
 import FastaIO
+import OutputIO
+import ORFCache
+import RunStats
+import heapq
 import argparse
+import cProfile
 import os, re, sys
-from CodonTable import getCodonTable
+from bisect import bisect_right
+from functools import lru_cache
+from itertools import chain, groupby, product
+from operator import attrgetter
+from contextlib import nullcontext
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Future
+from CodonTable import getGeneticCode, reverse_complement
+
+__author__ = "Guisen Chen <thecgs001@foxmil.com>"
+__all__ = ['ORF', 'ORFConfig', 'find_orfs', 'search_ORFs', 'find_ORFs_Pos', 'scan_ORFs_Pos', 
+           'filter_ORFs_Pos', 'parse_region', 'stream_ORFs', 'stream_orfs', 'sort_orfs', 'main']
 
 parser = argparse.ArgumentParser(description='Find open Reading Frames (ORFs)', add_help=False, epilog='date:2023/02/05 author:guisen chen email:thecgs001@foxmail.com')
 required = parser.add_argument_group('required arguments')
 optional = parser.add_argument_group('optional arguments')
-required.add_argument('-i', '--input', metavar='[input_file]', help='A file of fasta format', required=True)
-optional.add_argument('-o', '--output', metavar='[output_file]', help='A file of output. defualt: stdout.', default=sys.stdout)
-optional.add_argument('-outfmt', '--outfmt', metavar='[int]', type=int, choices=[0,1,2], help='Output file format. 0: fasta; 1: tsv; 2: gff. defualt: 0.', default=0)
+required.add_argument('-i', '--input', metavar='[input_file]', nargs='+', help='Files of fasta format, may be gzip, bgzip or bzip2 compressed, or tar or zip archives of fasta files, or UCSC .2bit files. A quoted glob pattern is expanded, @list.txt reads the file names listed in list.txt, one per line', required=True)
+optional.add_argument('-o', '--output', metavar='[output_file]', help='A file of output, compressed if it ends with .gz, .bgz (BGZF) or .bz2. defualt: stdout.', default=sys.stdout)
+optional.add_argument('-outfmt', '--outfmt', metavar='[int]', type=int, choices=sorted(OutputIO.WRITERS), help='Output file format. 0: fasta; 1: tsv; 2: gff, sorted by start within each record (not with -stream). defualt: 0.', default=0)
 optional.add_argument('-phase', '--phase', metavar='[int]', type=int, choices=[0,1,2,3], help='Start address of sequence. 0:all; 1: first base; 2: second base; 3: third base. defualt: 0.', default=0)
 optional.add_argument('-strand', '--strand', metavar='[int]', type=int, choices=[0,1,2], help='Search strand, 0: both; 1: +; 2: -. defualt: 0.', default=0)
 optional.add_argument('-min_len', '--min_len', metavar='[int]', type=int, help='Min Length. defualt: 0.', default=0)
@@ -23,149 +39,916 @@ optional.add_argument('-start_codons', '--start_codons', metavar='[str]', nargs=
 optional.add_argument('-start_codon_model', '--start_codon_model', metavar='[int]', type=int, choices=[0,1], help='ORF start codon to use. 0: only "ATG"; 1: "ATG" and alternative initiation codons. defualt: 0.', default=0)
 optional.add_argument('-remove_stop_codon', '--remove_stop_codon', action="store_true", help='Remove portein seqence stop codon. defualt: False.')
 optional.add_argument('-remove_nested', '--remove_nested', action="store_true", help='Ignore nested ORFs:. defualt: False.')
+optional.add_argument('-mask', '--mask', metavar='[str]', type=str, choices=['skip','include','exclude'], help='How soft-masked (lower case) bases are read. skip: no codon is read in them, ORFs may run through them; include: like upper case bases; exclude: no ORF overlaps them. defualt: skip.', default='skip')
+optional.add_argument('-regions', '--regions', metavar='[str]', nargs='+', type=str, help='Only search these regions, e.g. chr1 chr2:1-500000. defualt: None.', default=None)
+optional.add_argument('-threads', '--threads', metavar='[int]', type=int, help='Number of processes to search ORFs with. defualt: 1.', default=1)
+optional.add_argument('-mmap', '--mmap', action="store_true", help='Read uncompressed fasta files through mmap. defualt: False.')
+optional.add_argument('-prefetch', '--prefetch', metavar='[int]', type=int, help='Number of input files opened and decompressed ahead by a background thread, 0 to open them as they are read. defualt: 1.', default=1)
+optional.add_argument('-type_check', '--type_check', metavar='[str]', type=str, choices=list(FastaIO.TYPE_CHECKS), help='Check for protein records. full: whole sequence; sample: first 64 kb; none: trust the input. defualt: full.', default='full')
+optional.add_argument('-stats', '--stats', action="store_true", help='Write a JSON summary of time per stage, throughput and peak memory to stderr. defualt: False.')
+optional.add_argument('-profile', '--profile', metavar='[profile_file]', help='Write a cProfile dump of the run to this file (read it with pstats). defualt: None.', default=None)
+optional.add_argument('-cache', '--cache', metavar='[cache_file]', help='Cache ORF positions in this SQLite file, unchanged sequences searched with the same options are not searched again. defualt: None.', default=None)
+optional.add_argument('-cache_size', '--cache_size', metavar='[int]', type=int, help='Size limit of the cache in MB, least recently used entries are dropped first. defualt: 1024.', default=1024)
+optional.add_argument('-pipeline', '--pipeline', action="store_true", help='Read, search and write on separate threads connected by bounded queues. defualt: False.')
+optional.add_argument('-stream', '--stream', action="store_true", help='Scan records as they are read, memory is bounded by max_len instead of the record length. ORFs of both strands are written interleaved, in the order they are found. defualt: False.')
 optional.add_argument('-h', '--help', action='help', help='show this help message and exit')
 optional.add_argument('-v', '--version', action='version', version='v1.00')
-args = parser.parse_args()
 
-def find_ORFs_Pos(seqence, phase=0, codontable=1, start_codon_model=0, start_codons=None, stop_codons = None, min_len=0, max_len=float('inf'), remove_nested=True):
+WINDOW_SIZE = 10000000
+STREAM_WINDOW_SIZE = 1 << 20
+PIPELINE_DEPTH = 8
+PIPELINE_BATCH = 1000
+_ATG = frozenset(['ATG'])
+MASK_POLICIES = ('skip', 'include', 'exclude')
+
+@lru_cache(maxsize=None)
+def _codon_pattern(codons, ignore_case=False):
+    """Compile a lookahead pattern that matches every (overlapping) occurrence of codons.
+    """
+    return re.compile('(?=(' + '|'.join(re.escape(codon) for codon in sorted(codons)) + '))', re.IGNORECASE if ignore_case else 0)
+
+@lru_cache(maxsize=None)
+def _any_case(codons):
+    """Return codons with every mix of upper and lower case bases, for matches of a pattern ignoring case.
+    """
+    return frozenset(''.join(bases) for codon in codons for bases in product(*(base.upper() + base.lower() for base in codon)))
+
+def _between(runs, start, end):
+    """Return the (start, end) spans of start to end left outside the sorted runs.
+    """
+    spans = []
+    i = max(bisect_right(runs, (start,)) - 1, 0)
+    for run_start, run_end in runs[i:]:
+        if run_start >= end:
+            break
+        if run_end <= start:
+            continue
+        if run_start > start:
+            spans.append((start, run_start))
+        start = max(start, run_end)
+    if start < end:
+        spans.append((start, end))
+    return spans
+
+@lru_cache(maxsize=None)
+def _reverse_complement_codons(codons):
+    return frozenset(map(reverse_complement, codons))
+
+def _scan_frames(seqence, start_codons, stop_codons, offset=0, strand='+', min_len=0, max_len=float('inf'), segments=None, ignore_case=False):
+    """Scan the three frames of seqence in a single pass, starting with nothing known about the bases before it.
+    
+    Return (positions, first_stops, heads, tails) per frame (forward position % 3):
+    the ORF spans found entirely inside seqence, the first stop codon (-1 if none),
+    the start codon before it that an ORF crossing into seqence would use, and the
+    state left at the end: the open start codon for strand '+', the pending
+    (stop, start) pair for strand '-'. Frames and positions are counted from offset,
+    seqence being a window of a longer sequence.
+    
+    For strand '-' start_codons and stop_codons are reverse complemented codons:
+    each stop codon is the 5' end of an ORF whose start codon is the last one seen
+    before the next stop codon of the frame, so no reverse complement is built.
+    
+    Only spans of min_len to max_len bases are kept. With segments only codons lying
+    inside those (start, end) spans of seqence are read, the bases between them
+    (N gaps) are jumped over with the state of every frame kept. With ignore_case
+    lower case codons are read too.
+    """
+    first_stops = [-1, -1, -1]
+    heads = [-1, -1, -1]
+    positions = []
+    pattern = _codon_pattern(start_codons | stop_codons, ignore_case)
+    if ignore_case:
+        start_codons, stop_codons = _any_case(start_codons), _any_case(stop_codons)
+    if segments is None:
+        matches = pattern.finditer(seqence)
+    else:
+        matches = chain.from_iterable(pattern.finditer(seqence, start, end) for start, end in segments)
+    if strand == '+':
+        opened = [-1, -1, -1] #每个读码框中自上一个终止密码子以来的第一个起始密码子
+        for match in matches:
+            site = match.start() + offset
+            codon = match.group(1)
+            frame = site % 3
+            if codon in stop_codons:
+                if first_stops[frame] < 0:
+                    first_stops[frame] = site
+                    heads[frame] = opened[frame]
+                elif opened[frame] >= 0 and min_len <= site + 3 - opened[frame] <= max_len:
+                    positions.append((opened[frame], site + 3))
+                opened[frame] = -1
+            if codon in start_codons and opened[frame] < 0:
+                opened[frame] = site
+        return positions, first_stops, heads, opened
+    
+    stops = [-1, -1, -1] #每个读码框中最近的(反向)终止密码子
+    starts = [-1, -1, -1] #其后最近的(反向)起始密码子
+    for match in matches:
+        site = match.start() + offset
+        codon = match.group(1)
+        frame = site % 3
+        if codon in start_codons:
+            if stops[frame] >= 0:
+                starts[frame] = site
+            else:
+                heads[frame] = site
+        if codon in stop_codons:
+            if stops[frame] < 0:
+                first_stops[frame] = site
+            elif starts[frame] >= 0 and min_len <= starts[frame] + 3 - stops[frame] <= max_len:
+                positions.append((stops[frame], starts[frame] + 3))
+            stops[frame] = site
+            starts[frame] = -1
+    return positions, first_stops, heads, list(zip(stops, starts))
+
+def _stitch_step(carried, result, strand='+', min_len=0, max_len=float('inf')):
+    """Add the _scan_frames result of the next window to carried, the per-frame state left by the windows before it, return the ORF spans it completes.
+    
+    ORFs crossing window boundaries are kept if they are min_len to max_len bases long.
+    """
+    window_positions, first_stops, heads, state = result
+    positions = list(window_positions)
+    if strand == '+':
+        for frame in range(3):
+            if first_stops[frame] >= 0:
+                start = carried[frame] if carried[frame] >= 0 else heads[frame]
+                if start >= 0 and min_len <= first_stops[frame] + 3 - start <= max_len:
+                    positions.append((start, first_stops[frame] + 3))
+                carried[frame] = state[frame]
+            elif carried[frame] < 0:
+                carried[frame] = state[frame]
+    else:
+        for frame in range(3):
+            stop, start = carried[frame]
+            if first_stops[frame] >= 0:
+                start = heads[frame] if heads[frame] >= 0 else start
+                if stop >= 0 and start >= 0 and min_len <= start + 3 - stop <= max_len:
+                    positions.append((stop, start + 3))
+                carried[frame] = state[frame]
+            elif stop >= 0 and heads[frame] >= 0:
+                carried[frame] = (stop, heads[frame])
+    return positions
+
+def _stitch_end(carried, strand='+', min_len=0, max_len=float('inf')):
+    """Return the ORF spans left open at the end of the sequence: none for strand '+', the pending ones for strand '-'.
+    """
+    if strand == '+':
+        return []
+    return [(stop, start + 3) for stop, start in carried if stop >= 0 and start >= 0 and min_len <= start + 3 - stop <= max_len]
+
+def _stitch_frames(results, strand='+', min_len=0, max_len=float('inf')):
+    """Join the _scan_frames results of consecutive windows into the sorted ORF spans of the whole sequence.
+    """
+    positions = []
+    carried = [-1, -1, -1] if strand == '+' else [(-1, -1)] * 3
+    for result in results:
+        positions.extend(_stitch_step(carried, result, strand, min_len, max_len))
+    positions.extend(_stitch_end(carried, strand, min_len, max_len))
+    positions.sort()
+    return positions
+
+def _scan_window(args):
+    """Worker entry point: scan one window, see _scan_frames.
+    """
+    return _scan_frames(*args)
+
+def _pool_workers(pool, threads=1):
+    """Return the number of workers of pool, threads if the executor does not tell.
+    """
+    return max(getattr(pool, '_max_workers', 0), threads, 1)
+
+def _imap_ordered(pool, func, items, ahead):
+    """Yield func(item) for every item, computed on pool, in input order with at most ahead items in flight.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(func, item))
+        if len(pending) >= ahead:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def _scan_windows(seqence, start_codons, stop_codons, window_size=WINDOW_SIZE, threads=1, pool=None, strand='+', min_len=0, max_len=float('inf'), 
+                  start=0, end=None, gaps=None, ignore_case=False):
+    """Scan seqence (or its bases start to end) as windows of window_size bases on a process pool, return sorted ORF spans.
+    
+    Neighbouring windows overlap by the two bases needed to read codons across the
+    boundary. Each window is scanned without knowing what was open before it, and
+    _stitch_frames rebuilds the ORFs crossing window boundaries from the state
+    carried over from the previous windows, which gives exactly the spans of a
+    single-window scan. Each window is given the part of the gaps index it covers.
+    """
+    end = len(seqence) if end is None else end
+    def window(a):
+        b = min(a + window_size + 2, end)
+        segments = [(x - a, y - a) for x, y in _between(gaps, a, b)] if gaps else None
+        return seqence[a:b], start_codons, stop_codons, a, strand, min_len, max_len, segments, ignore_case
+    windows = (window(a) for a in range(start, end, window_size))
+    if pool is None:
+        with ProcessPoolExecutor(threads) as pool:
+            return _stitch_frames(_imap_ordered(pool, _scan_window, windows, threads * 2), strand, min_len, max_len)
+    return _stitch_frames(_imap_ordered(pool, _scan_window, windows, _pool_workers(pool, threads) * 2), strand, min_len, max_len)
+
+def _strand_codons(start_codons, stop_codons, strand='+', codontable=None):
+    """Return start_codons and stop_codons as upper case frozensets, reverse complemented for strand '-'.
+    
+    The codons of codontable (a GeneticCode) use the reverse complemented sets it holds.
+    """
+    if not isinstance(start_codons, frozenset):
+        start_codons = frozenset(codon.upper() for codon in start_codons)
+    if not isinstance(stop_codons, frozenset):
+        stop_codons = frozenset(codon.upper() for codon in stop_codons)
+    if strand == '-':
+        if codontable is not None and start_codons is codontable.start_codons:
+            start_codons = codontable.rc_start_codons
+        else:
+            start_codons = _reverse_complement_codons(start_codons)
+        if codontable is not None and stop_codons is codontable.stop_codons:
+            stop_codons = codontable.rc_stop_codons
+        else:
+            stop_codons = _reverse_complement_codons(stop_codons)
+    return start_codons, stop_codons
+
+def scan_ORFs_Pos(seqence, start_codons, stop_codons, threads=1, window_size=WINDOW_SIZE, pool=None, strand='+', min_len=0, max_len=float('inf'), 
+                  gaps=None, masked=None, ignore_case=False, codontable=None):
+    """Scan the three frames of seqence in a single pass, return sorted ORF spans.
+
+    Each stop codon closes the ORF opened by the first start codon seen in the same
+    frame since the previous stop codon, so the work is O(n) whatever the number of
+    start and stop codons. With strand '-' the ORFs of the reverse complement are
+    found by scanning seqence for reverse complemented codons, and the spans are
+    returned on seqence itself. Sequences longer than window_size are split into
+    windows scanned on threads processes (or on pool) when threads > 1 or pool is given.
+    Spans shorter than min_len or longer than max_len are dropped as they are found.
+    
+    gaps and masked are sorted (start, end) runs of seqence (see FastaIO.gap_runs and
+    FastaIO.masked_runs). The scan jumps over gaps, which hold no codon, as if their
+    bases were read. Masked runs end every ORF: the bases between them are scanned as
+    separate sequences. With ignore_case lower case codons are read too. codontable
+    is the GeneticCode the codons come from, if they do.
+    """
+    start_codons, stop_codons = _strand_codons(start_codons, stop_codons, strand, codontable)
+    if not start_codons or not stop_codons:
+        return []
+    pieces = [(0, len(seqence))] if masked is None else _between(masked, 0, len(seqence))
+    positions = []
+    for start, end in pieces:
+        if end - start > window_size and (threads > 1 or pool is not None):
+            positions.extend(_scan_windows(seqence, start_codons, stop_codons, window_size, threads, pool, strand, min_len, max_len, 
+                                           start, end, gaps, ignore_case))
+            continue
+        if gaps:
+            segments = _between(gaps, start, end)
+        else:
+            segments = [(start, end)] if masked is not None else None
+        result = _scan_frames(seqence, start_codons, stop_codons, 0, strand, min_len, max_len, segments, ignore_case)
+        positions.extend(_stitch_frames([result], strand, min_len, max_len))
+    return positions
+
+def filter_ORFs_Pos(positions, phase=0, remove_nested=False):
+    """Filter ORF spans with one sweep over the spans sorted by (start, end).
+
+    Spans sharing a start keep only the shortest one (the longer ones run through
+    an in-frame stop codon), remove_nested drops spans contained in an earlier
+    span, and phase 1, 2, 3 keeps spans that start on the first, second or third base.
+    """
+    #相位0, 1, 2, 3
+    if phase in (1, 2, 3):
+        positions = [i for i in positions if i[0] % 3 == phase - 1]
+    
+    filtered = []
+    last_start = -1
+    max_end = -1
+    for start, end in sorted(positions):
+        #去除中间有终止密码子的ORF
+        if start == last_start:
+            continue
+        last_start = start
+        #仅保留最长ORF
+        if remove_nested and end <= max_end:
+            continue
+        max_end = max(max_end, end)
+        filtered.append((start, end))
+    return filtered
+
+def _search_codons(codontable=1, start_codon_model=0, start_codons=None, stop_codons=None):
+    """Return (GeneticCode, start codons, stop codons) of the search options.
+    """
+    codontable = getGeneticCode(codontable)
     if start_codons == None:
         if start_codon_model == 0:
-            start_codons = ['ATG']
+            start_codons = _ATG
         else:
-            start_codons = getCodonTable(codontable)[1]
+            start_codons = codontable.start_codons
     if stop_codons  == None:
-        stop_codons = getCodonTable(codontable)[2]
+        stop_codons = codontable.stop_codons
+    return codontable, start_codons, stop_codons
+
+def _gap_free(start_codons, stop_codons):
+    """Return True if no codon holds an N, so that no codon can be read inside an N gap.
+    """
+    return not any('N' in codon.upper() for codon in chain(start_codons, stop_codons))
+
+def find_ORFs_Pos(seqence, phase=0, codontable=1, start_codon_model=0, start_codons=None, stop_codons = None, min_len=0, max_len=float('inf'), remove_nested=True, threads=1, window_size=WINDOW_SIZE, pool=None, strand='+', 
+                  mask='skip', gaps=None, masked=None):
+    """Return the sorted (start, end) spans of the ORFs of seqence on strand '+' or '-'.
     
-    patterns = []
-    for start_codon in start_codons:
-        for stop_codon in stop_codons:
-            patterns.append(start_codon + '(...)*' + stop_codon)
-            patterns.append(start_codon + '(...)*?' + stop_codon)
-    
-    positions = []
-    for pattern in patterns:
-        positions.extend(list(re.finditer(pattern, seqence)))
-
-    positions = sorted(list({i.span() for i in positions})) #去重并排序
-    positions = [i for i in positions if ((i[1] - i[0]) >= min_len and (i[1] - i[0]) <= max_len)] #ORF长度限制
-    
-    for i in positions:
-        for j in positions:
-            #去除中间有终止密码子的ORF
-            if i[0] == j[0]:
-                if i[1] < j[1]:
-                    if j in positions:
-                        positions.remove(j)
-                elif i[1] > j[1]:
-                    if i in positions:
-                        positions.remove(i)
-            #仅保留最长ORF
-            if remove_nested==True:
-                if i[0] < j[0] and j[1] <= i[1]:
-                    if j in positions:
-                        positions.remove(j)
-                elif j[0] < i[0] and i[1] <= i[1]:
-                    if i in positions:
-                        positions.remove(i)
-            #相位0, 1, 2, 3
-            if phase == 1:
-                if i[0]%3 != 0 and i in positions:
-                    positions.remove(i)
-            if phase == 2:
-                if i[0]%3 != 1 and i in positions:
-                    positions.remove(i)
-            if phase == 3:
-                if i[0]%3 != 2 and i in positions:
-                    positions.remove(i)
-            else:
-                pass
+    For strand '-' the spans are coordinates on the reverse complement of seqence.
     
+    mask is how soft-masked (lower case) bases are read: 'skip' reads no codon in
+    them and lets ORFs run through them, 'include' reads them like upper case bases
+    and 'exclude' drops every ORF overlapping them. gaps and masked are the run index
+    of seqence (FastaIO.gap_runs, FastaIO.masked_runs), built here when not given;
+    masked is only used by 'exclude'.
+    """
+    if mask not in MASK_POLICIES:
+        raise ValueError('mask must be one of {}, not {!r}'.format(MASK_POLICIES, mask))
+    codontable, start_codons, stop_codons = _search_codons(codontable, start_codon_model, start_codons, stop_codons)
+    with RunStats.timer('index'):
+        if not _gap_free(start_codons, stop_codons):
+            gaps = None
+        elif gaps is None:
+            gaps = FastaIO.gap_runs(seqence)
+        if mask != 'exclude':
+            masked = None
+        elif masked is None:
+            masked = FastaIO.masked_runs(seqence)
+    with RunStats.timer('scan'):
+        positions = scan_ORFs_Pos(seqence, start_codons, stop_codons, threads, window_size, pool, strand, min_len, max_len, 
+                                  gaps, masked, mask == 'include', codontable) #ORF长度限制在扫描时完成
+    with RunStats.timer('filter'):
+        if strand == '-':
+            l = len(seqence)
+            positions = [(l - end, l - start) for start, end in positions] #反向互补序列上的坐标
+        positions = filter_ORFs_Pos(positions, phase, remove_nested)
     return positions
 
 
 
-def main(input_file, outfmt=0, output_file=sys.stdout, remove_stop_codon=True, strand=0, phase=0, codontable=1, start_codon_model=0, start_codons=None, stop_codons = None, min_len=0, max_len=float('inf'), remove_nested=True, translate=False):
+def parse_region(region, names=()):
+    """Parse a samtools-style region 'ID', 'ID:start' or 'ID:start-end' (1-based, inclusive) into (ID, start, end) (0-based, half-open).
     
-    num = 1
-    if output_file==sys.stdout:
-        out = output_file
+    As in samtools a region found in names (e.g. FastaIO.faidx()) is a whole sequence,
+    otherwise it is split on its last ':', so IDs like 'HLA-A*01:01' can be used.
+    """
+    region = region.strip()
+    if region in names:
+        return region, None, None
+    if not region:
+        raise Exception("can't parse region {}".format(region))
+    m = re.match(r'^(.+):([\d,]+)(?:-([\d,]+))?$', region)
+    if not m:
+        return region, None, None
+    ID, start, end = m.groups()
+    start = int(start.replace(',', '')) - 1 if start else None
+    end = int(end.replace(',', '')) if end else None
+    return ID, start, end
+
+def _ORF_seqence(seqence, start, end, strand='+', translate=False, remove_stop_codon=False, codontable=1):
+    """Return the ORF seqence of the forward span seqence[start:end] as a string.
+    
+    A FastaIO.TwoBitSeqence seqence is cut with slice and translated on its 2-bit codes.
+    """
+    if translate == True and isinstance(seqence, FastaIO.TwoBitSeqence):
+        ORF = seqence.translate(codontable, start, end, strand)
     else:
-        out = open(output_file,'w')
+        ORF = FastaIO.NucleicSeqence(seqence.slice(start, end) if isinstance(seqence, FastaIO.TwoBitSeqence) else seqence[start:end])
+        if strand == '-':
+            ORF = ORF.reverse_compliment()
+        if translate == True:
+            ORF = ORF.translate(codontable=codontable)
+    if translate == True and remove_stop_codon == True:
+        ORF = ORF.remove_StopCodon()
+    return str(ORF)
+
+def search_ORFs(seqence, strand='+', translate=False, remove_stop_codon=False, codontable=1, **kwargs):
+    """Find the ORFs of one strand of seqence, return a list of (start, end, ORF seqence).
     
-    if outfmt==1:
-        out.write('ID\tStrand\tSource\tStart\tEnd\tLength\tSeqence\n')
-            
-    for record in FastaIO.FastaIO(input_file).parse():
-        # +
-        if strand == 1 or strand == 0:
-            seqence = record.Seq._Seq
-            positions = find_ORFs_Pos(seqence, phase, codontable, start_codon_model, start_codons, stop_codons, min_len, max_len, remove_nested)
-            for position in positions:
-                if translate == True:
-                    if remove_stop_codon == True:
-                        if outfmt == 0:
-                            out.write('>ORF'+ str(num) + '\tLength: ' + str(position[1] - position[0]) + '\t' + 'Strand: +' + '\t' + 'Source: ' + record.Name + ':' + str(position[0]+1) + '-' + str(position[1]) + '\n' + str(FastaIO.NucleicSeqence(seqence[position[0]:position[1]]).translate(codontable=codontable).remove_StopCodon())+'\n')
-                        elif outfmt == 1:
-                            out.write('ORF'+ str(num) + '\t+\t' + record.Name + '\t' + str(position[0]+1) + '\t' + str(position[1]) + '\t' + str(position[1] - position[0]) + '\t' + str(FastaIO.NucleicSeqence(seqence[position[0]:position[1]]).translate(codontable=codontable).remove_StopCodon()) + '\n')
-                        elif outfmt == 2:
-                            out.write(record.Name + '\tfind_ORFs\tORF\t' + str(position[0]+1) + '\t' + str(position[1]) + '\t.\t+\t.\tID=ORF' + str(num) + '; Length=' + str(position[1] - position[0]) + '; Seqence=' + str(FastaIO.NucleicSeqence(seqence[position[0]:position[1]]).translate(codontable=codontable).remove_StopCodon()) + ';\n')
-                    else:
-                        if outfmt == 0:
-                            out.write('>ORF'+ str(num) + '\tLength: ' + str(position[1] - position[0]) + '\t' + 'Strand: +' + '\t' + 'Source: ' + record.Name + ':' + str(position[0]+1) + '-' + str(position[1]) + '\n' + str(FastaIO.NucleicSeqence(seqence[position[0]:position[1]]).translate(codontable=codontable))+'\n')
-                        elif outfmt == 1:
-                            out.write('ORF'+ str(num) + '\t+\t' + record.Name + '\t' + str(position[0]+1) + '\t' + str(position[1]) + '\t' + str(position[1] - position[0]) + '\t' + str(FastaIO.NucleicSeqence(seqence[position[0]:position[1]]).translate(codontable=codontable)) + '\n')
-                        elif outfmt == 2:
-                            out.write(record.Name + '\tfind_ORFs\tORF\t' + str(position[0]+1) + '\t' + str(position[1]) + '\t.\t+\t.\tID=ORF' + str(num) + '; Length=' + str(position[1] - position[0]) + '; Seqence=' + str(FastaIO.NucleicSeqence(seqence[position[0]:position[1]]).translate(codontable=codontable)) + ';\n')      
+    For strand '-' the positions refer to the reverse complement of seqence, only
+    the ORF slices themselves are reverse complemented.
+    """
+    l = len(seqence)
+    ORFs = []
+    for start, end in find_ORFs_Pos(seqence, codontable=codontable, strand=strand, **kwargs):
+        if strand == '-':
+            ORF = _ORF_seqence(seqence, l - end, l - start, strand, translate, remove_stop_codon, codontable)
+        else:
+            ORF = _ORF_seqence(seqence, start, end, strand, translate, remove_stop_codon, codontable)
+        ORFs.append((start, end, ORF))
+    return ORFs
+
+class _ORFStream:
+    """State of stream_ORFs on one strand: the per-frame scan state and the spans not yet known to be final
+    """
+    def __init__(self, strand, start_codons, stop_codons, phase=0, min_len=0, max_len=float('inf'), remove_nested=False, ignore_case=False, codontable=None):
+        self.strand = strand
+        self.ignore_case = ignore_case
+        self.start_codons, self.stop_codons = _strand_codons(start_codons, stop_codons, strand, codontable)
+        self.phase = phase
+        self.min_len = min_len
+        self.max_len = max_len
+        self.remove_nested = remove_nested
+        self.carried = [-1, -1, -1] if strand == '+' else [(-1, -1)] * 3
+        self.pending = [] #按(start, end)排序的堆
+        self.max_end = -1
+    
+    def feed(self, window, offset, end, segments=None):
+        """Scan window (the sites offset to end, and the two bases after), or only its segments, return the spans that are final.
+        """
+        result = _scan_frames(window, self.start_codons, self.stop_codons, offset, self.strand, self.min_len, self.max_len, segments, self.ignore_case)
+        for span in _stitch_step(self.carried, result, self.strand, self.min_len, self.max_len):
+            heapq.heappush(self.pending, span)
+        return self.release(self.lowest(end))
+    
+    def lowest(self, end):
+        """Return the lowest start a span found after site end could have.
+        
+        Frames whose open ORF can only grow past max_len no longer hold anything back.
+        """
+        lowest = end
+        if self.strand == '+':
+            for start in self.carried:
+                if start >= 0 and end + 3 - start <= self.max_len:
+                    lowest = min(lowest, start)
+        else:
+            for stop, start in self.carried:
+                if stop >= 0 and ((start >= 0 and start + 3 - stop <= self.max_len) or end + 3 - stop <= self.max_len):
+                    lowest = min(lowest, stop)
+        return lowest
+    
+    def release(self, lowest):
+        """Pop the spans starting before lowest, in order, and filter them like filter_ORFs_Pos.
+        """
+        spans = []
+        while self.pending and self.pending[0][0] < lowest:
+            start, end = heapq.heappop(self.pending)
+            if self.phase in (1, 2, 3) and start % 3 != self.phase - 1:
+                continue
+            if self.remove_nested:
+                if end <= self.max_end:
+                    continue
+                self.max_end = end
+            spans.append((start, end))
+        return spans
+    
+    def finish(self):
+        for span in _stitch_end(self.carried, self.strand, self.min_len, self.max_len):
+            heapq.heappush(self.pending, span)
+        return self.release(float('inf'))
+
+def stream_ORFs(chunks, strands=('+', '-'), phase=0, codontable=1, start_codon_model=0, start_codons=None, stop_codons=None, min_len=0, max_len=float('inf'), 
+                remove_nested=True, translate=False, remove_stop_codon=False, window_size=STREAM_WINDOW_SIZE, mask='skip'):
+    """Find the ORFs of one sequence given as an iterable of seqence chunks, yield (strand, start, end, ORF seqence) as soon as they are known.
+    
+    The sequence is scanned in windows of window_size bases, with the per-frame state
+    carried from one window to the next, and only the bases an ORF may still need are
+    kept: memory is bounded by max_len (or the longest open ORF) plus window_size,
+    not by the length of the sequence. start and end are 0-based, half-open, on the
+    forward strand for both strands. Each strand yields the same ORFs as
+    find_ORFs_Pos, in order of start, but the strands are interleaved. phase is only
+    supported on strand '+', the phase of a strand '-' ORF depends on the length of
+    the sequence. mask may be 'skip' or 'include' (see find_ORFs_Pos), the N gaps of
+    each window are jumped over.
+    """
+    if phase in (1, 2, 3) and '-' in strands:
+        raise ValueError("phase needs the length of the sequence on strand '-', it can't be used when streaming strand '-'")
+    if mask not in ('skip', 'include'):
+        raise ValueError("mask must be 'skip' or 'include' when streaming, not {!r}".format(mask))
+    codontable, start_codons, stop_codons = _search_codons(codontable, start_codon_model, start_codons, stop_codons)
+    if not start_codons or not stop_codons:
+        return
+    streams = [_ORFStream(strand, start_codons, stop_codons, phase, min_len, max_len, remove_nested, mask == 'include', codontable) for strand in strands]
+    gap_free = _gap_free(start_codons, stop_codons)
+    buffer, buffer_start, pos = '', 0, 0
+    
+    def scan(end):
+        window = buffer[pos - buffer_start:end - buffer_start + 2]
+        with RunStats.timer('index'):
+            gaps = FastaIO.gap_runs(window) if gap_free else None
+            segments = _between(gaps, 0, len(window)) if gaps else None
+        with RunStats.timer('scan'):
+            spans = [(stream.strand, stream.feed(window, pos, end, segments)) for stream in streams]
+        for strand, positions in spans:
+            for start, stop in positions:
+                yield strand, start, stop, _ORF_seqence(buffer, start - buffer_start, stop - buffer_start, strand, translate, remove_stop_codon, codontable)
+    
+    parts, size = [], 0
+    for chunk in chunks:
+        parts.append(chunk)
+        size += len(chunk)
+        if buffer_start + len(buffer) + size - pos < window_size + 2:
+            continue
+        buffer += ''.join(parts)
+        parts, size = [], 0
+        while buffer_start + len(buffer) - pos >= window_size + 2:
+            yield from scan(pos + window_size)
+            pos += window_size
+            keep = min(stream.lowest(pos) for stream in streams)
+            buffer = buffer[keep - buffer_start:]
+            buffer_start = keep
+    buffer += ''.join(parts)
+    if buffer_start + len(buffer) > pos:
+        yield from scan(buffer_start + len(buffer))
+    for stream in streams:
+        for start, stop in stream.finish():
+            yield stream.strand, start, stop, _ORF_seqence(buffer, start - buffer_start, stop - buffer_start, stream.strand, translate, remove_stop_codon, codontable)
+
+def _search_batch(batch):
+    """Worker entry point: run search_ORFs over a batch of (seqence, strand, options) work units.
+    """
+    return [search_ORFs(seqence, strand, **options) for seqence, strand, options in batch]
+
+def _imap_batches(units, threads=1, batch_size=1000000, window_size=WINDOW_SIZE, pool=None):
+    """Yield the ORFs of every (seqence, strand, options) work unit, in input order.
+    
+    A unit may also be a done Future holding a list of one result, which is yielded
+    in its place without being searched.
+    
+    Units are grouped into batches of about batch_size bases and spread over a pool
+    of threads processes (or over pool, an executor kept by the caller). Only twice
+    as many batches as the pool has workers are in flight at a time, so the input
+    is never read far ahead of the output. A unit longer than window_size is searched by a thread
+    of the main process, with its windows scanned on the pool, while the next units
+    (the other strand of the same record) go on.
+    """
+    if pool is None:
+        if threads <= 1:
+            for unit in units:
+                if isinstance(unit, Future):
+                    yield from unit.result()
+                    continue
+                seqence, strand, options = unit
+                yield search_ORFs(seqence, strand, **options)
+        else:
+            with ProcessPoolExecutor(threads) as pool:
+                yield from _imap_batches(units, threads, batch_size, window_size, pool)
+        return
+    
+    def batches():
+        batch, size = [], 0
+        for unit in units:
+            if isinstance(unit, Future):
+                if batch:
+                    yield batch
+                    batch, size = [], 0
+                yield unit
+                continue
+            if len(unit[0]) > window_size:
+                if batch:
+                    yield batch
+                    batch, size = [], 0
+                yield unit
+                continue
+            batch.append(unit)
+            size += len(unit[0])
+            if size >= batch_size:
+                yield batch
+                batch, size = [], 0
+        if batch:
+            yield batch
+    
+    workers = _pool_workers(pool, threads)
+    def search_windowed(seqence, strand, options):
+        return [search_ORFs(seqence, strand, threads=workers, window_size=window_size, pool=pool, **options)]
+    
+    pending = deque()
+    # 长序列在主进程的线程中分窗口提交, 两条链的窗口可同时在进程池中扫描
+    with ThreadPoolExecutor(2) as windowed:
+        for batch in batches():
+            if isinstance(batch, Future):
+                pending.append(batch)
+                continue
+            if isinstance(batch, tuple):
+                pending.append(windowed.submit(search_windowed, *batch))
+            else:
+                pending.append(pool.submit(_search_batch, batch))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+class ORF:
+    """An ORF found by find_orfs, with the coordinates written to the output (1-based, inclusive).
+    
+    Iterates like the tuple (ID, Strand, Source, Start, End, Length, Seq). When built
+    with the record seqence instead of Seq, only the offsets are kept and Seq is cut
+    (and translated) from the record each time it is read.
+    """
+    __slots__ = ('ID', 'Strand', 'Source', 'Start', 'End', 'Length', '_seq', '_seqence', '_offset', '_config')
+    _fields = ('ID', 'Strand', 'Source', 'Start', 'End', 'Length', 'Seq')
+    
+    def __init__(self, ID, Strand, Source, Start, End, Length, Seq=None, seqence=None, offset=0, config=None):
+        self.ID = ID
+        self.Strand = Strand
+        self.Source = Source
+        self.Start = Start
+        self.End = End
+        self.Length = Length
+        self._seq = Seq
+        self._seqence = seqence
+        self._offset = offset
+        self._config = config
+    
+    @property
+    def Seq(self):
+        if self._seq is not None:
+            return self._seq
+        config = self._config
+        with RunStats.timer('seqence'):
+            return _ORF_seqence(self._seqence, self.Start - 1 - self._offset, self.End - self._offset, self.Strand, 
+                                config.translate, config.remove_stop_codon, config.codontable)
+    
+    def __iter__(self):
+        return iter((self.ID, self.Strand, self.Source, self.Start, self.End, self.Length, self.Seq))
+    
+    def __len__(self):
+        return len(self._fields)
+    
+    def __getitem__(self, index):
+        return tuple(self)[index]
+    
+    def __eq__(self, other):
+        return tuple(self) == tuple(other) if isinstance(other, (ORF, tuple)) else NotImplemented
+    
+    def __hash__(self):
+        return hash(tuple(self))
+    
+    def __repr__(self):
+        return 'ORF({})'.format(', '.join('{}={!r}'.format(key, value) for key, value in zip(self._fields, self)))
+
+class ORFConfig:
+    """Search options of find_orfs, reusable across calls.
+    """
+    def __init__(self, strand=0, phase=0, codontable=1, start_codon_model=0, start_codons=None, stop_codons=None, min_len=0, max_len=float('inf'), 
+                 remove_nested=False, translate=False, remove_stop_codon=False, threads=1, window_size=WINDOW_SIZE, mask='skip'):
+        if mask not in MASK_POLICIES:
+            raise ValueError('mask must be one of {}, not {!r}'.format(MASK_POLICIES, mask))
+        self.strand = strand
+        self.phase = phase
+        self.codontable = getGeneticCode(codontable)
+        self.start_codon_model = start_codon_model
+        self.start_codons = start_codons
+        self.stop_codons = stop_codons
+        self.min_len = min_len
+        self.max_len = max_len
+        self.remove_nested = remove_nested
+        self.translate = translate
+        self.remove_stop_codon = remove_stop_codon
+        self.threads = threads
+        self.window_size = window_size
+        self.mask = mask
+    
+    def __repr__(self):
+        return 'ORFConfig({})'.format(', '.join('{}={!r}'.format(key, value) for key, value in vars(self).items()))
+    
+    def strands(self):
+        return [strand for strand in ('+', '-') if self.strand == 0 or self.strand == ('+', '-').index(strand) + 1]
+    
+    def scan_options(self):
+        """Return the keyword arguments of find_ORFs_Pos.
+        """
+        return dict(codontable=self.codontable, phase=self.phase, start_codon_model=self.start_codon_model, 
+                    start_codons=self.start_codons, stop_codons=self.stop_codons, 
+                    min_len=self.min_len, max_len=self.max_len, remove_nested=self.remove_nested, mask=self.mask)
+    
+    def options(self):
+        """Return the keyword arguments of search_ORFs.
+        """
+        return dict(translate=self.translate, remove_stop_codon=self.remove_stop_codon, **self.scan_options())
+
+def _record_runs(record, seqence, mask='skip'):
+    """Return the (gaps, masked) run index of a record, built once for both strands; masked is None unless mask is 'exclude'.
+    """
+    with RunStats.timer('index'):
+        Seq = record.Seq
+        if not isinstance(Seq, FastaIO.NucleicSeqence):
+            Seq = FastaIO.NucleicSeqence._wrap(seqence)
+        return Seq.gaps(), Seq.masked() if mask == 'exclude' else None
+
+def _cached_positions(cache, digest, strand, scan_options):
+    """Return (cache key, cached spans or None) of a seqence on strand.
+    """
+    with RunStats.timer('cache'):
+        key = ORFCache.cache_key(digest, strand, scan_options)
+        positions = cache.get(key)
+    RunStats.count('cache_hits' if positions is not None else 'cache_misses')
+    return key, positions
+
+def find_orfs(records, config=None, num=1, pool=None, cache=None):
+    """Find the ORFs of records (FastaSeqence objects), yield ORF objects numbered from num.
+    
+    pool is an optional concurrent.futures executor kept between calls by a
+    long-running caller, used instead of starting config.threads processes. A record with an Offset attribute (see FastaIO.fetch) is a window of a longer
+    sequence, its ORF coordinates are reported on the whole sequence.
+    
+    Without a pool or threads, ORFs keep only their offsets into the record and their
+    seqences are cut at output time; ORFs from worker processes carry their seqences.
+    
+    cache is an optional ORFCache.ORFCache, records found in it are not searched again
+    and the ORF spans of the others are added to it.
+    
+    The N gap index of a record (and its soft-mask index for mask 'exclude') is built
+    once and used for both strands, .2bit records carry theirs from the file. The ORFs
+    of .2bit records cut their seqences from the packed record, the unpacked seqence
+    is only kept while it is searched.
+    """
+    if config is None:
+        config = ORFConfig()
+    scan_options = config.scan_options()
+    if pool is None and config.threads <= 1:
+        for record in records:
+            seqence = str(record.Seq)
+            l = len(seqence)
+            offset = record.Offset
+            RunStats.count('bases', l)
+            digest = ORFCache.seqence_hash(seqence) if cache is not None else None
+            runs = None
+            found = []
+            for strand in config.strands():
+                positions = None
+                if cache is not None:
+                    key, positions = _cached_positions(cache, digest, strand, scan_options)
+                if positions is None:
+                    if runs is None:
+                        runs = _record_runs(record, seqence, config.mask)
+                    positions = find_ORFs_Pos(seqence, strand=strand, gaps=runs[0], masked=runs[1], **scan_options)
+                    if cache is not None:
+                        cache.put(key, positions)
+                found.append((strand, positions))
+            if isinstance(record.Seq, FastaIO.TwoBitSeqence):
+                # ORF序列从2-bit序列截取, 不保留解压后的整条序列
+                seqence = record.Seq
+            for strand, positions in found:
+                for start, end in positions:
+                    if strand == '-':
+                        start, end = l - end, l - start
+                    yield ORF('ORF' + str(num), strand, record.Name, offset + start + 1, offset + end, end - start, 
+                              seqence=seqence, offset=offset, config=config)
+                    num += 1
+                    RunStats.count('ORFs')
+        return
+    
+    options = config.options()
+    units = deque()
+    def work_units():
+        for record in records:
+            seqence = str(record.Seq)
+            RunStats.count('bases', len(seqence))
+            digest = ORFCache.seqence_hash(seqence) if cache is not None else None
+            record_options = None
+            for strand in config.strands():
+                if cache is not None:
+                    key, positions = _cached_positions(cache, digest, strand, scan_options)
+                    if positions is not None:
+                        # 命中缓存的序列不再搜索, ORF序列在输出时截取
+                        Seq = record.Seq if isinstance(record.Seq, FastaIO.TwoBitSeqence) else seqence
+                        units.append((record.Name, len(seqence), record.Offset, strand, Seq, None))
+                        done = Future()
+                        done.set_result([positions])
+                        yield done
+                        continue
                 else:
-                    if outfmt == 0:
-                        out.write('>ORF'+ str(num) + '\tLength: ' + str(position[1] - position[0]) + '\t' + 'Strand: +' + '\t' + 'Source: ' + record.Name + ':' + str(position[0]+1) + '-' + str(position[1]) + '\n' + str(FastaIO.NucleicSeqence(seqence[position[0]:position[1]]))+'\n')
-                    elif outfmt == 1:
-                        out.write('ORF'+ str(num) + '\t+\t' + record.Name + '\t' + str(position[0]+1) + '\t' + str(position[1]) + '\t' + str(position[1] - position[0]) + '\t' + str(FastaIO.NucleicSeqence(seqence[position[0]:position[1]])) + '\n')
-                    elif outfmt == 2:
-                        out.write(record.Name + '\tfind_ORFs\tORF\t' + str(position[0]+1) + '\t' + str(position[1]) + '\t.\t+\t.\tID=ORF' + str(num) + '; Length=' + str(position[1] - position[0]) + '; Seqence=' + str(FastaIO.NucleicSeqence(seqence[position[0]:position[1]])) + ';\n')     
-                num += 1
-        # -
-        if strand == 2 or strand == 0:
-            seqence = str(record.Seq.reverse_compliment())
-            positions = find_ORFs_Pos(seqence, phase, codontable, start_codon_model, start_codons, stop_codons, min_len, max_len, remove_nested)
+                    key = None
+                units.append((record.Name, len(seqence), record.Offset, strand, None, key))
+                if record_options is None:
+                    gaps, masked = _record_runs(record, seqence, config.mask)
+                    record_options = dict(options, gaps=gaps, masked=masked)
+                yield seqence, strand, record_options
+    
+    for ORFs in RunStats.iterate('search', _imap_batches(work_units(), config.threads, window_size=config.window_size, pool=pool)):
+        Name, l, offset, strand, seqence, key = units.popleft()
+        if key is not None:
+            cache.put(key, [position[:2] for position in ORFs])
+        for position in ORFs:
+            if strand == '+':
+                start, end = offset + position[0] + 1, offset + position[1]
+            else:
+                start, end = offset + l - position[1] + 1, offset + l - position[0]
+            yield ORF('ORF' + str(num), strand, Name, start, end, position[1] - position[0], None if seqence is not None else position[2], 
+                      seqence=seqence, offset=offset, config=config)
+            num += 1
+            RunStats.count('ORFs')
+
+def sort_orfs(ORFs, num=1):
+    """Yield ORFs (of find_orfs) with the ORFs of each record sorted by Start, numbered again from num.
+    
+    find_orfs yields the ORFs of a record strand by strand, the minus strand last
+    ending first; sorted by Start they can be written as a GFF file indexable by tabix.
+    The ORFs of one record are held in memory.
+    """
+    for Source, group in groupby(ORFs, attrgetter('Source')):
+        for orf in sorted(group, key=attrgetter('Start')):
+            orf.ID = 'ORF' + str(num)
+            num += 1
+            yield orf
+
+def stream_orfs(records, config=None, num=1):
+    """Find the ORFs of records streamed by FastaIO.stream, yield ORF objects numbered from num as soon as they are found.
+    
+    Records are never held whole in memory, see stream_ORFs. ORFs of the two strands
+    come interleaved, and config.threads is not used.
+    """
+    if config is None:
+        config = ORFConfig()
+    options = config.options()
+    def counted(chunks):
+        for chunk in RunStats.iterate('parse', chunks):
+            RunStats.count('bases', len(chunk))
+            yield chunk
+    
+    for ID, Name, Description, chunks in records:
+        for strand, start, end, Seq in stream_ORFs(counted(chunks), config.strands(), **options):
+            yield ORF('ORF' + str(num), strand, Name, start + 1, end, end - start, Seq)
+            num += 1
+            RunStats.count('ORFs')
+
+def main(input_file, outfmt=0, output_file=sys.stdout, use_mmap=False, regions=None, type_check='full', stats=False, profile=None, 
+         cache_file=None, cache_size=1024, pipeline=False, stream=False, prefetch=1, **kwargs):
+    """Command line entry point, kwargs are the options of ORFConfig.
+    
+    With stats a JSON summary of the run is written to stderr, with profile a
+    cProfile dump of the run is written to that file. With cache_file the ORF
+    spans are cached in that file, kept under cache_size MB. With pipeline the
+    records are read on one thread and searched on another, ahead of the main
+    thread formatting and writing ORFs, connected by bounded queues. With stream
+    records are scanned as they are read without being held whole in memory, see
+    stream_orfs. prefetch is the number of input files opened ahead, see FastaIO.
+    GFF output (outfmt 2) is sorted by start within each record, see sort_orfs.
+    """
+    if stream and (regions is not None or cache_file is not None):
+        raise ValueError('stream can not be used with regions or cache_file')
+    profiler = cProfile.Profile() if profile is not None else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        with RunStats.collect() if stats else nullcontext() as run_stats:
+            config = ORFConfig(**kwargs)
+            fasta = FastaIO.FastaIO(input_file, use_mmap=use_mmap, threads=config.threads, type_check=type_check, prefetch=prefetch)
+            if stream:
+                records = fasta.stream()
+            elif regions == None:
+                records = fasta.parse()
+            else:
+                records = (fasta.fetch(*parse_region(region, fasta.faidx())) for region in regions)
             
-            l = len(seqence)
-            for position in positions:
-                if translate == True:
-                    if remove_stop_codon == True:
-                        if outfmt == 0:
-                            out.write('>ORF'+ str(num) + '\tLength: ' + str(position[1] - position[0]) + '\t' + 'Strand: -' + '\t' + 'Source: ' + record.Name + ':' + str(l - position[1]) + '-' + str(l - position[0]+1) + '\n' + str(FastaIO.NucleicSeqence(seqence[position[0]:position[1]]).translate(codontable=codontable).remove_StopCodon())+'\n')
-                        elif outfmt == 1:
-                            out.write('ORF'+ str(num) + '\t-\t' + record.Name + '\t' + str(l - position[1]) + '\t' + str(l - position[0]+1) + '\t' + str(position[1] - position[0]) + '\t' + str(FastaIO.NucleicSeqence(seqence[position[0]:position[1]]).translate(codontable=codontable).remove_StopCodon()) + '\n')
-                        elif outfmt == 2:
-                            out.write(record.Name + '\tfind_ORFs\tORF\t' + str(l - position[1]) + '\t' + str(l - position[0]+1) + '\t.\t-\t.\tID=ORF' + str(num) + '; Length=' + str(position[1] - position[0]) + '; Seqence=' + str(FastaIO.NucleicSeqence(seqence[position[0]:position[1]]).translate(codontable=codontable).remove_StopCodon()) + ';\n')
-                    else:
-                        if outfmt == 0:
-                            out.write('>ORF'+ str(num) + '\tLength: ' + str(position[1] - position[0]) + '\t' + 'Strand: -' + '\t' + 'Source: ' + record.Name + ':' + str(l - position[1]) + '-' + str(l - position[0]+1) + '\n' + str(FastaIO.NucleicSeqence(seqence[position[0]:position[1]]).translate(codontable=codontable))+'\n')
-                        elif outfmt == 1:
-                            out.write('ORF'+ str(num) + '\t-\t' + record.Name + '\t' + str(l - position[1]) + '\t' + str(l - position[0]+1) + '\t' + str(position[1] - position[0]) + '\t' + str(FastaIO.NucleicSeqence(seqence[position[0]:position[1]]).translate(codontable=codontable)) + '\n')
-                        elif outfmt == 2:
-                            out.write(record.Name + '\tfind_ORFs\tORF\t' + str(l - position[1]) + '\t' + str(l - position[0]+1) + '\t.\t-\t.\tID=ORF' + str(num) + '; Length=' + str(position[1] - position[0]) + '; Seqence=' + str(FastaIO.NucleicSeqence(seqence[position[0]:position[1]]).translate(codontable=codontable)) + ';\n')      
+            cache = ORFCache.ORFCache(cache_file, cache_size << 20) if cache_file is not None else None
+            with OutputIO.get_writer(outfmt, output_file, threads=config.threads) as writer:
+                if stream:
+                    ORFs = stream_orfs(records, config)
+                elif pipeline:
+                    records = FastaIO.iter_threaded(records, PIPELINE_DEPTH, name='records')
+                    ORFs = find_orfs(records, config, cache=cache)
                 else:
-                    if outfmt == 0:
-                        out.write('>ORF'+ str(num) + '\tLength: ' + str(position[1] - position[0]) + '\t' + 'Strand: -' + '\t' + 'Source: ' + record.Name + ':' + str(l - position[1]) + '-' + str(l - position[0]+1) + '\n' + str(FastaIO.NucleicSeqence(seqence[position[0]:position[1]]))+'\n')
-                    elif outfmt == 1:
-                        out.write('ORF'+ str(num) + '\t-\t' + record.Name + '\t' + str(l - position[1]) + '\t' + str(l - position[0]+1) + '\t' + str(position[1] - position[0]) + '\t' + str(FastaIO.NucleicSeqence(seqence[position[0]:position[1]])) + '\n')
-                    elif outfmt == 2:
-                        out.write(record.Name + '\tfind_ORFs\tORF\t' + str(l - position[1]) + '\t' + str(l - position[0]+1) + '\t.\t-\t.\tID=ORF' + str(num) + '; Length=' + str(position[1] - position[0]) + '; Seqence=' + str(FastaIO.NucleicSeqence(seqence[position[0]:position[1]])) + ';\n')
-                num += 1
-
-main(input_file=args.input, \
-     outfmt=args.outfmt, \
-     output_file=args.output, \
-     remove_stop_codon=args.remove_stop_codon, \
-     strand=args.strand, \
-     phase=args.phase, \
-     codontable=args.codontable, \
-     start_codon_model=args.start_codon_model, \
-     start_codons=args.start_codons, \
-     stop_codons=args.stop_codons, \
-     min_len=args.min_len, \
-     max_len=args.max_len, \
-     remove_nested=args.remove_nested, \
-     translate=args.translate)
\ No newline at end of file
+                    ORFs = find_orfs(records, config, cache=cache)
+                if outfmt == 2 and not stream:
+                    ORFs = sort_orfs(ORFs)
+                if pipeline:
+                    ORFs = FastaIO.iter_threaded(ORFs, PIPELINE_DEPTH, PIPELINE_BATCH, name='ORFs')
+                with RunStats.timer('write'):
+                    writer.write_all(ORFs)
+            if cache is not None:
+                cache.close()
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile)
+    if run_stats is not None:
+        run_stats.write(sys.stderr)
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    if args.stream:
+        # 流式读取不支持随机访问, 检查与之冲突的参数
+        if args.regions:
+            parser.error('argument -stream: not allowed with argument -regions')
+        if args.cache:
+            parser.error('argument -stream: not allowed with argument -cache')
+        if args.mask == 'exclude':
+            parser.error('argument -stream: not allowed with argument -mask exclude')
+        if args.phase and args.strand != 1:
+            parser.error('argument -stream: argument -phase requires -strand 1 (+ strand only)')
+    main(input_file=args.input, \
+         outfmt=args.outfmt, \
+         output_file=args.output, \
+         use_mmap=args.mmap, \
+         regions=args.regions, \
+         type_check=args.type_check, \
+         stats=args.stats, \
+         profile=args.profile, \
+         cache_file=args.cache, \
+         cache_size=args.cache_size, \
+         pipeline=args.pipeline, \
+         stream=args.stream, \
+         prefetch=args.prefetch, \
+         remove_stop_codon=args.remove_stop_codon, \
+         strand=args.strand, \
+         phase=args.phase, \
+         codontable=args.codontable, \
+         start_codon_model=args.start_codon_model, \
+         start_codons=args.start_codons, \
+         stop_codons=args.stop_codons, \
+         min_len=args.min_len, \
+         max_len=args.max_len, \
+         remove_nested=args.remove_nested, \
+         translate=args.translate, \
+         mask=args.mask, \
+         threads=args.threads)
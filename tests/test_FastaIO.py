@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import FastaIO
+
+__author__ = "Guisen Chen <thecgs001@foxmil.com>"
+
+def test_fai_last_line_without_newline(tmp_path):
+    path = tmp_path / 'f.fa'
+    path.write_bytes(b'>a\nATGAAATAG\n>b\nATGAAATAGCC')
+    fai = FastaIO.build_fai(str(path))
+    assert [(record.name, record.length, record.linebases, record.linewidth) for record in fai] == [('a', 9, 9, 10), ('b', 11, 11, 12)]
+    fasta = FastaIO.FastaIO(str(path))
+    assert str(fasta.fetch('b').Seq) == 'ATGAAATAGCC'
+    assert str(fasta.fetch('b', 3, 9).Seq) == 'AAATAG'
+    fasta.close()
+
+def test_block_reader():
+    data = bytes(range(256)) * 100
+    blocks = [data[i:i + n] for i, n in zip(range(0, len(data), 777), [777] * 40)]
+    reader = FastaIO.BlockReader(iter(blocks + [b'', data[777 * 40:]]))
+    assert reader.peek(4) == data[:4]
+    parts = []
+    for size in [1, 10, 1000, 3, 0, 5000] * 10:
+        parts.append(reader.read(size))
+    parts.append(reader.read())
+    assert b''.join(parts) == data
+    assert reader.read(10) == b''
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import io
+import json
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import FastaIO
+from find_ORFs import ORFConfig, find_orfs, find_ORFs_Pos, main, parse_region, _between
+
+__author__ = "Guisen Chen <thecgs001@foxmil.com>"
+
+def random_seqence(n, seed, gaps=False, masked=False):
+    """Return a seeded random seqence of about n bases, with runs of N and of lower case bases if asked for.
+    """
+    rnd = random.Random(seed)
+    parts, size = [], 0
+    while size < n:
+        m = rnd.randint(1, 400)
+        kind = rnd.choice(['gap', 'masked', 'bases', 'bases'])
+        if kind == 'gap' and gaps:
+            part = 'N' * m
+        else:
+            part = ''.join(rnd.choice('ACGT') for i in range(m))
+            if kind == 'masked' and masked:
+                part = part.lower()
+        parts.append(part)
+        size += m
+    return ''.join(parts)[:n]
+
+def test_mask_exclude_with_n_codon():
+    seqence = random_seqence(3000, 1, gaps=True, masked=True)
+    masked = FastaIO.masked_runs(seqence)
+    for strand in '+-':
+        positions = find_ORFs_Pos(seqence, strand=strand, mask='exclude', start_codons=['NTG', 'ATG'], remove_nested=False)
+        l = len(seqence)
+        spans = positions if strand == '+' else [(l - end, l - start) for start, end in positions]
+        assert all(not any(start < b and a < end for a, b in masked) for start, end in spans)
+        expected = []
+        for a, b in _between(masked, 0, l):
+            piece = find_ORFs_Pos(seqence[a:b], strand=strand, start_codons=['NTG', 'ATG'], remove_nested=False)
+            if strand == '+':
+                expected.extend((start + a, end + a) for start, end in piece)
+            else:
+                expected.extend((start + l - b, end + l - b) for start, end in piece)
+        assert positions == sorted(expected)
+
+@pytest.fixture(scope='module')
+def pool():
+    with ProcessPoolExecutor(2) as pool:
+        yield pool
+
+@pytest.mark.parametrize('seed', range(6))
+@pytest.mark.parametrize('strand', '+-')
+@pytest.mark.parametrize('options', [{}, {'start_codon_model': 1}, {'min_len': 60, 'max_len': 900}, {'phase': 2, 'remove_nested': False},
+                                     {'mask': 'include'}, {'mask': 'exclude', 'codontable': 11}])
+def test_windows_match_single_scan(pool, seed, strand, options):
+    seqence = random_seqence(20000, seed, gaps=seed % 2 == 1, masked=seed % 3 == 0)
+    expected = find_ORFs_Pos(seqence, strand=strand, **options)
+    for window_size in (97, 1000, 7001):
+        assert find_ORFs_Pos(seqence, strand=strand, window_size=window_size, pool=pool, **options) == expected
+    assert find_ORFs_Pos(seqence, strand=strand, window_size=1000, threads=2, **options) == expected
+
+def test_find_orfs_threads_match_serial(pool):
+    records = [FastaIO.FastaSeqence(('r{}'.format(i), 'r{}'.format(i), '', FastaIO.NucleicSeqence(random_seqence(n, i, gaps=True))))
+               for i, n in enumerate([300, 25000, 800, 40000, 50])]
+    expected = [tuple(orf) for orf in find_orfs(records, ORFConfig(min_len=30))]
+    config = ORFConfig(min_len=30, threads=2, window_size=5000)
+    assert [tuple(orf) for orf in find_orfs(records, config)] == expected
+    assert [tuple(orf) for orf in find_orfs(records, config, pool=pool)] == expected
+
+@pytest.mark.parametrize('threads', [1, 2])
+def test_pipeline_cache(tmp_path, capsys, threads):
+    fasta = tmp_path / 'a.fa'
+    fasta.write_text(''.join('>r{}\n{}\n'.format(i, random_seqence(n, i, gaps=True)) for i, n in enumerate([3000, 500, 8000])))
+    cache_file = str(tmp_path / 'c.db')
+    outputs, stats = [], []
+    for run in range(2):
+        output = io.StringIO()
+        main([str(fasta)], output_file=output, stats=True, pipeline=True, cache_file=cache_file, threads=threads)
+        outputs.append(output.getvalue())
+        stats.append(json.loads(capsys.readouterr().err))
+    assert outputs[0] and outputs[1] == outputs[0]
+    assert stats[0]['cache_misses'] == 6 and 'cache_hits' not in stats[0]
+    assert stats[1]['cache_hits'] == 6 and 'cache_misses' not in stats[1]
+
+def test_gff_sorted_by_start(tmp_path):
+    fasta = tmp_path / 'a.fa'
+    fasta.write_text(''.join('>r{}\n{}\n'.format(i, random_seqence(n, i)) for i, n in enumerate([3000, 8000])))
+    output = io.StringIO()
+    main([str(fasta)], outfmt=2, output_file=output)
+    rows = [line.split('\t') for line in output.getvalue().splitlines()]
+    assert [(row[0], int(row[3])) for row in rows] == sorted((row[0], int(row[3])) for row in rows)
+    assert [row[8].split(';')[0] for row in rows] == ['ID=ORF{}'.format(i + 1) for i in range(len(rows))]
+    assert sorted(tuple(row[3:8]) for row in rows) == sorted((str(orf.Start), str(orf.End), '.', orf.Strand, '.')
+                                                      for orf in find_orfs(FastaIO.FastaIO(str(fasta)).parse()))
+
+@pytest.mark.parametrize('translate', [False, True])
+def test_twobit_orfs_cut_from_packed(translate):
+    seqences = [random_seqence(n, i, gaps=True, masked=True) for i, n in enumerate([5000, 300, 70000])]
+    plain = [FastaIO.FastaSeqence(('r{}'.format(i), 'r{}'.format(i), '', FastaIO.NucleicSeqence(s))) for i, s in enumerate(seqences)]
+    packed = [FastaIO.FastaSeqence(('r{}'.format(i), 'r{}'.format(i), '', FastaIO.TwoBitSeqence.from_string(s))) for i, s in enumerate(seqences)]
+    config = ORFConfig(translate=translate, codontable=11)
+    ORFs = list(find_orfs(packed, config))
+    assert all(isinstance(orf._seqence, FastaIO.TwoBitSeqence) for orf in ORFs)
+    assert [tuple(orf) for orf in ORFs] == [tuple(orf) for orf in find_orfs(plain, config)]
+
+def test_region_id_with_colon(tmp_path):
+    assert parse_region('chr1:1,001-2,000') == ('chr1', 1000, 2000)
+    assert parse_region('HLA-A*01:01') == ('HLA-A*01', 0, None)
+    assert parse_region('HLA-A*01:01', {'HLA-A*01:01'}) == ('HLA-A*01:01', None, None)
+    assert parse_region('HLA-A*01:01:101-600', {'HLA-A*01:01'}) == ('HLA-A*01:01', 100, 600)
+    fasta = tmp_path / 'hla.fa'
+    fasta.write_text('>HLA-A*01\n{}\n>HLA-A*01:01\n{}\n'.format(random_seqence(900, 1), random_seqence(1200, 2)))
+    output = io.StringIO()
+    main([str(fasta)], outfmt=1, output_file=output, regions=['HLA-A*01:01', 'HLA-A*01:01:101-600'])
+    rows = [line.split('\t') for line in output.getvalue().splitlines()[1:]]
+    assert rows and {row[2] for row in rows} == {'HLA-A*01:01'}
+    assert max(int(row[4]) for row in rows) > 600